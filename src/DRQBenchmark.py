@@ -0,0 +1,132 @@
+#!/usr/bin/python2.7
+# encoding: utf-8
+'''
+DRQBenchmark -- Benchmarks for the DRQPatternAttack simulator
+
+Times parsing, partitioning, the range query generators and the attackers of DRQPatternAttack separately and writes the
+results to a JSON file, so the performance of different versions can be compared. Can also generate synthetic pattern
+files, which are used if no real dataset is given.
+
+@author:     Max Maass
+
+@copyright:  2013 Max Maass
+
+@license:    BSD 2-clause license
+'''
+
+import sys
+import os
+import json
+import time
+import platform
+import tempfile
+import var.Config           # Config Variables
+import bench.Synthetic      # Synthetic pattern files
+import bench.Suite          # Benchmarks
+
+from argparse import ArgumentParser
+
+__version__ = '0.1'
+
+
+def synthesize(path, args):
+    """Write a synthetic pattern file according to the command line arguments
+
+    @param path: The path of the file
+    @param args: The parsed command line arguments
+    """
+    with open(path, "w") as fobj:
+        bench.Synthetic.generate(fobj, args.targets, args.exponent, args.max_length, args.overlap, args.seed)
+
+
+def printResults(results):
+    """Print the results of the benchmarks as a table
+
+    @param results: The list of result dictionaries, as returned by bench.Suite.run
+    """
+    print "%-30s %10s %10s %14s %12s %12s" % ("benchmark", "ops", "seconds", "ops/sec", "rss (KiB)", "change (KiB)")
+    for result in results:
+        print "%-30s %10i %10.3f %14.1f %12i %+12i" % (result["name"], result["ops"], result["seconds"],
+                                                        result["ops_per_sec"] or 0.0, result["rss_kb"],
+                                                        result["rss_delta_kb"])
+
+
+def main(argv=None):  # IGNORE:C0111
+    """Main function
+
+    Parses CLI options, runs the benchmarks and writes the results.
+    """
+    if argv is None:
+        argv = sys.argv
+    else:
+        sys.argv.extend(argv)
+    program_name = os.path.basename(sys.argv[0])
+
+    try:
+        parser = ArgumentParser(description="Benchmark the stages of DRQPatternAttack on a pattern file, or on a synthetic one if no file is given.")
+        parser.add_argument("file", nargs="?", help="select pattern file (a synthetic one is generated if omitted).", default="")
+        parser.add_argument('--synthesize', dest="synthesize", metavar="FILE", help="Only write a synthetic pattern file to FILE and exit", type=str, default="")
+        parser.add_argument('-n', '--targets', dest="targets", help="Number of targets of the synthetic pattern file [default %(default)s]", default="10000", type=int)
+        parser.add_argument('--exponent', dest="exponent", help="Exponent of the Zipf-like pattern length distribution of the synthetic pattern file [default %(default)s]", default="1.5", type=float)
+        parser.add_argument('--max-length', dest="max_length", help="Maximum pattern length of the synthetic pattern file [default %(default)s]", default="30", type=int)
+        parser.add_argument('--overlap', dest="overlap", help="Probability of a query being shared with other patterns in the synthetic pattern file [default %(default)s]", default="0.5", type=float)
+        parser.add_argument('--seed', dest="seed", help="Seed of the random number generators [default %(default)s]", default="0", type=int)
+        parser.add_argument('-s', '--size', dest="num", help="Size of the range query [default %(default)s]", default="50", type=int)
+        parser.add_argument('-p', '--partition', dest="partition", help="Number of Queries the Client should be allowed to use [default %(default)s for all queries]", default="-1", type=int)
+        parser.add_argument('-c', '--count', dest="cnt", help="Number of targets the generators and attackers are run on [default %(default)s]", default="1000", type=int)
+        parser.add_argument('-r', '--repeat', dest="repeat", help="Number of partitions created by the partition benchmark, of the size given by -p or of half the queries if that is -1 [default %(default)s]", default="3", type=int)
+        parser.add_argument('-o', '--output', dest="output", metavar="FILE", help="Write the results to FILE (JSON) [default %(default)s]", default="benchmark.json", type=str)
+        parser.add_argument("-q", "--quiet", dest="quiet", action="store_true", help="enable quiet mode.")
+        parser.add_argument('--version', action='version', version='%%(prog)s v%s' % __version__)
+        args = parser.parse_args()
+
+        if args.synthesize:
+            synthesize(args.synthesize, args)
+            return 0
+
+        var.Config.QUIET = True     # Keep the output of the parser out of the results
+        var.Config.RQSIZE = args.num
+        var.Config.DBSPLIT = args.partition
+        temporary = not args.file
+        if temporary:
+            fd, var.Config.INFILE = tempfile.mkstemp(suffix=".txt")
+            os.close(fd)
+            synthesize(var.Config.INFILE, args)
+        else:
+            var.Config.INFILE = args.file
+        try:
+            results = bench.Suite.run(args.num, args.partition, args.cnt, args.repeat, args.seed)
+            dataset = bench.Suite.getDatasetInfo(var.Config.INFILE)
+        finally:
+            if temporary:
+                os.remove(var.Config.INFILE)
+        if temporary:
+            dataset["file"] = None
+            dataset["synthetic"] = {"targets": args.targets, "exponent": args.exponent, "max_length": args.max_length,
+                                    "overlap": args.overlap, "seed": args.seed}
+
+        report = {"version": __version__,
+                  "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                  "python": platform.python_version(),
+                  "platform": platform.platform(),
+                  "dataset": dataset,
+                  "settings": {"size": args.num, "partition": args.partition, "count": args.cnt,
+                               "repeat": args.repeat, "seed": args.seed, "batch": var.Config.BATCH},
+                  "results": results}
+        with open(args.output, "w") as fobj:
+            json.dump(report, fobj, indent=2, sort_keys=True)
+            fobj.write("\n")
+        if not args.quiet:
+            printResults(results)
+        return 0
+
+    except KeyboardInterrupt:
+        return 1
+    except Exception, e:
+        indent = len(program_name) * " "
+        sys.stderr.write(program_name + ": " + repr(e) + "\n")
+        sys.stderr.write(indent + "  for help use --help\n")
+        return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
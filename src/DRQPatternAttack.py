@@ -18,14 +18,24 @@ DRQPatternAttack is a simulator for the semantic intersection Attack on DNS Rang
 import sys
 import os
 import var.Config           # Config Variables
+import var.Context          # Settings of a single run
 import parse.Pattern        # Parser for pattern file
 import generate.DRQ         # DNS Range Query generator
 import attacker.Pattern     # Attacker
 import data.DB              # Database
+import data.Corpus          # Recorded range queries
+import data.Strata          # Stratified choice of targets
 import util.Progress        # Progress Bar
 import util.Error           # Error logging
 import util.Parallel        # Parallel Processing
 import util.FileManagement  # File Management for stat output
+import util.Statistics      # Online statistics
+import util.Stream          # Streaming result output
+import util.Checkpoint      # Checkpoints of long runs
+import util.Profile         # Per-phase timing and profiling
+import functools
+import random
+import time
 
 from argparse import ArgumentParser
 from argparse import RawDescriptionHelpFormatter
@@ -49,13 +59,15 @@ class CLIError(Exception):
         return self.msg
 
 
-def getGeneratorFor(genID):
+def getGeneratorFor(genID, context=None):
     """Generator selector
 
     Resolves a GeneratorID to the matching generator.
 
     @param genID: The ID of the Generator
-    @return: A Reference to the type of Generator (that can be directly initialized, if needed)
+    @param context: The var.Context.RunContext the generator should use (None for var.Config)
+    @return: A Reference to the type of Generator (that can be directly initialized, if needed). If a context is given,
+        the generator is bound to it.
     """
     generators = {1: generate.DRQ.BRQ().NDBRQ,
                   2: generate.DRQ.BRQ().DFBRQ,
@@ -63,6 +75,8 @@ def getGeneratorFor(genID):
                   4: generate.DRQ.PBRQ().NDBRQ,
                   5: generate.DRQ.PBRQ().DFBRQ,
                   6: generate.DRQ.PBRQ().FDBRQ}
+    if context is not None:
+        return functools.partial(generators[genID], context)
     return generators[genID]
 
 
@@ -74,39 +88,86 @@ def getAttackerFor(attID):
     @param attID: The ID of the attacker
     @return: A Reference to the type of Attacker (that can be directly initialized, if needed)
     """
-    attackers = {1: attacker.Pattern.NDBPattern,
+    if var.Config.ENGINE == "matrix":
+        ndb = attacker.Pattern.NDBPatternMatrix
+    else:
+        ndb = attacker.Pattern.NDBPattern
+    attackers = {1: ndb,
                  2: attacker.Pattern.DFBPatternPRQ,
                  3: attacker.Pattern.FDBPattern,
-                 4: attacker.Pattern.NDBPattern,
+                 4: ndb,
                  5: attacker.Pattern.DFBPatternPRQ,
                  6: attacker.Pattern.FDBPattern}
+    if var.Config.COUNT: # The attacker only has to return the number of possible results
+        return attacker.Pattern.getCounter(attackers[attID], var.Config.CAP if var.Config.CAP > 0 else None)
     return attackers[attID]
 
 
-def chooseTargets(number_of_targets):
+def getComparedModes(mode):
+    """Get the modes compared by --compare
+
+    @param mode: The ID of a mode
+    @return: The IDs of the modes using the same generation strategy as the given one, ordered by attack model (no
+        distinguishable blocks, distinguishable first block, fully distinguishable blocks)
+    """
+    return [1, 2, 3] if mode <= 3 else [4, 5, 6]
+
+
+def getCombinedGeneratorFor(genID, context=None):
+    """Combined generator selector
+
+    Resolves a GeneratorID to the combined generator using the same generation strategy, which returns the range query
+    in the formats of the modes returned by getComparedModes.
+
+    @param genID: The ID of the Generator
+    @param context: The var.Context.RunContext the generator should use (None for var.Config)
+    @return: A Reference to the type of Generator, like getGeneratorFor
+    """
+    generator = generate.DRQ.BRQ().CRQ if genID <= 3 else generate.DRQ.PBRQ().CRQ
+    if context is not None:
+        return functools.partial(generator, context)
+    return generator
+
+
+def getCombinedAttackerFor(attID):
+    """Combined attacker selector
+
+    @param attID: The ID of the attacker
+    @return: A Reference to an attacker (that can be directly initialized) attacking the range queries of the combined
+        generator returned by getCombinedGeneratorFor, using the attackers of the modes returned by getComparedModes
+    """
+    return functools.partial(attacker.Pattern.Combined, [getAttackerFor(mode) for mode in getComparedModes(attID)])
+
+
+def chooseTargets(number_of_targets, rng=random, replace=True):
     """Choose a number of random targets
 
     This function will choose number_of_targets random patterns to be attacked.
 
     @param number_of_targets: The number of targets to be returned.
-    @return: A list of targets
+    @param rng: The random number generator to use (see var.Context.RunContext.getRandom)
+    @param replace: False to choose distinct targets (at most all targets of the client database)
+    @return: A list of targets (host IDs)
     """
+    if not replace:
+        return data.DB.getRandomTargets(number_of_targets, rng)
     returnValue = []
     for i in range(number_of_targets):
-        returnValue.append(data.DB.getRandomTarget())
+        returnValue.append(data.DB.getRandomTarget(rng))
     return returnValue
 
 
-def generateFor(generatorInstance, domain):
+def generateFor(generatorInstance, domain, rep=0):
     """Generate a range Query
 
     Generates a range Query for the provided domain using the provided, uninitialized generatorInstance
 
     @param generatorInstance: An uninitialized Generator, as returned by getGeneratorFor(genID)
     @param domain: The domain the generator should generate a range query for.
+    @param rep: The number of range queries generated for the domain before (see var.Context.getRepetitions)
     @return: The result of the generator.
     """
-    return generatorInstance().generateDRQFor(domain)
+    return generatorInstance().generateDRQFor(domain, rep)
 
 
 def attack(attackInstance, inputValue):
@@ -129,86 +190,353 @@ def attackList(attackerInstance, generatorInstance, list_of_domains):
     @param attackerInstance: An uninitialized Attacker, as returned by getAttackerFor(attID)
     @param generatorInstance: An uninitialized Generator, as returned by getGeneratorFor(genID)
     @param list_of_domains: A list of Domains, as returned by chooseTargets(number_of_targets)
-    @return: A Dictionary, mapping domains to the results of the attackers.
+    @return: A list of (domain (host ID), result of the attacker)-tuples, one per element of list_of_domains. A domain
+        that has been chosen more than once is attacked and counted once per occurrence.
+    """
+    results = iterAttackList(attackerInstance, generatorInstance, list_of_domains)
+    return [(domain, result) for domain, _, result in results]
+
+
+def iterAttackList(attackerInstance, generatorInstance, list_of_domains, repetitions=None):
+    """Attack a list of targets, yielding the results one by one
+
+    Generate range queries for a list of domains and attack them using the provided attackerInstance.
+    If the attacker supports attacking batches of range queries, var.Config.BATCH range queries are generated and attacked
+    at once.
+
+    @param attackerInstance: An uninitialized Attacker, as returned by getAttackerFor(attID)
+    @param generatorInstance: An uninitialized Generator, as returned by getGeneratorFor(genID)
+    @param list_of_domains: A list of Domains, as returned by chooseTargets(number_of_targets)
+    @param repetitions: The list of repetition numbers of the domains, or None to number their occurrences in
+        list_of_domains (see var.Context.getRepetitions)
+    @return: A generator yielding (domain, repetition, result of the attacker)-tuples
     """
     stat = util.Progress.Bar(len(list_of_domains), "=") # Get a progress bar instance to use
-    returnValue = {}
-    for domain in list_of_domains: # Iterate through all targets, generating Range queries and attacking them
-        returnValue[domain] = attack(attackerInstance, generateFor(generatorInstance, domain))
+    if repetitions is None:
+        repetitions = var.Context.getRepetitions(list_of_domains)
+    if hasattr(attackerInstance, "attackBatch"):
+        instance = attackerInstance()
+        for i in range(0, len(list_of_domains), var.Config.BATCH): # Iterate through the targets in batches
+            domains = list_of_domains[i:i+var.Config.BATCH]
+            reps = repetitions[i:i+var.Config.BATCH]
+            rqs = util.Profile.measure("generate", lambda: [generateFor(generatorInstance, domain, rep) for domain, rep in zip(domains, reps)])
+            results = util.Profile.measure("attack", instance.attackBatch, rqs)
+            for domain, rep, result in zip(domains, reps, results):
+                stat.tick() # Update stats
+                yield domain, rep, result
+        return
+    for domain, rep in zip(list_of_domains, repetitions): # Iterate through all targets, generating Range queries and attacking them
+        rq = util.Profile.measure("generate", generateFor, generatorInstance, domain, rep)
+        result = util.Profile.measure("attack", attack, attackerInstance, rq)
         stat.tick() # Update stats
-    return returnValue
+        yield domain, rep, result
 
 
 def attackParallel(attackerInstance, generatorInstance, list_of_domains):
     """Attack a list of targets using multiple threads
 
     Parallelize the generation and attacking of a list of domains using multiple threads.
-    Delegates all work to the util.Parallel module.
+    Delegates all work to the util.Parallel module, which hands out the domains to a pool of processes in chunks.
 
     @param attackerInstance: An uninitialized Attacker, as returned by getAttackerFor(attID)
     @param generatorInstance: An uninitialized Generator, as returned by getGeneratorFor(genID)
     @param list_of_domains: A list of Domains, as returned by chooseTargets(number_of_targets)
-    @return: The result of the util.Parallel.parallelize function (a dictionary, similar to attackList)
+    @return: The result of the util.Parallel.parallelize function (a list of (domain, result)-tuples, like attackList)
     """
     stat = util.Progress.Bar(len(list_of_domains), "=")
     return util.Parallel.parallelize(attackerInstance, generatorInstance, list_of_domains, stat)
 
 
-def validateResults(attackResultDictionary):
+def iterAttackParallel(attackerInstance, generatorInstance, list_of_domains, repetitions=None):
+    """Attack a list of targets using multiple threads, yielding the results as they arrive
+
+    @param attackerInstance: An uninitialized Attacker, as returned by getAttackerFor(attID)
+    @param generatorInstance: An uninitialized Generator, as returned by getGeneratorFor(genID)
+    @param list_of_domains: A list of Domains, as returned by chooseTargets(number_of_targets)
+    @param repetitions: The list of repetition numbers of the domains, or None to number their occurrences in
+        list_of_domains (see var.Context.getRepetitions)
+    @return: A generator yielding (domain, repetition, result of the attacker)-tuples, similar to iterAttackList
+    """
+    stat = util.Progress.Bar(len(list_of_domains), "=")
+    for results in util.Parallel.iterParallel(attackerInstance, generatorInstance, list_of_domains, stat, repetitions):
+        for result in results:
+            yield result
+
+
+def iterAttackReduced(attackerInstance, generatorInstance, list_of_domains, repetitions=None):
+    """Attack a list of targets using multiple threads, yielding only the statistics of the results
+
+    The workers reduce the results of each chunk to a histogram and validate them (see util.Parallel.reduceChunk), so
+    the candidate lists are never sent to this process.
+
+    @param attackerInstance: An uninitialized Attacker, as returned by getAttackerFor(attID)
+    @param generatorInstance: An uninitialized Generator, as returned by getGeneratorFor(genID)
+    @param list_of_domains: A list of Domains, as returned by chooseTargets(number_of_targets)
+    @param repetitions: The list of repetition numbers of the domains, or None to number their occurrences in
+        list_of_domains (see var.Context.getRepetitions)
+    @return: A generator yielding one ((domain, repetition)-tuples, util.Statistics.Histogram, invalid domain or
+        None)-tuple per chunk
+    """
+    stat = util.Progress.Bar(len(list_of_domains), "=")
+    for reduced in util.Parallel.iterParallel(attackerInstance, generatorInstance, list_of_domains, stat, repetitions,
+                                              True):
+        yield reduced
+
+
+def iterAttack(attackerInstance, generatorInstance, list_of_domains, repetitions=None):
+    """Attack a list of targets, yielding the results as they arrive
+
+    Uses iterAttackParallel if more than one thread has been requested, iterAttackList otherwise. If the results are
+    reduced in the workers (var.Config.REDUCE), iterAttackReduced is used instead of iterAttackParallel, and the
+    returned generator has to be consumed by collectReduced instead of collectResults.
+
+    @param attackerInstance: An uninitialized Attacker, as returned by getAttackerFor(attID)
+    @param generatorInstance: An uninitialized Generator, as returned by getGeneratorFor(genID)
+    @param list_of_domains: A list of Domains, as returned by chooseTargets(number_of_targets)
+    @param repetitions: The list of repetition numbers of the domains, or None to number their occurrences in
+        list_of_domains (see var.Context.getRepetitions)
+    @return: A generator yielding (domain, repetition, result of the attacker)-tuples
+    """
+    if var.Config.THREADS > 1 and var.Config.REDUCE:
+        return iterAttackReduced(attackerInstance, generatorInstance, list_of_domains, repetitions)
+    if var.Config.THREADS > 1:
+        return iterAttackParallel(attackerInstance, generatorInstance, list_of_domains, repetitions)
+    return iterAttackList(attackerInstance, generatorInstance, list_of_domains, repetitions)
+
+
+def iterAdaptive(attackerInstance, generatorInstance, context, histogram, round_size):
+    """Attack random targets in rounds, until the statistics are precise enough
+
+    After every round of round_size targets, the confidence intervals of the proportions in the histogram are checked
+    (see util.Statistics.Histogram.getWidestInterval). The attack stops once the widest one is at most var.Config.CI
+    wide, or once var.Config.MAXTARGETS targets have been attacked or var.Config.MAXTIME seconds have passed.
+    The targets are drawn from the same random number generator in every round, so a run that stops after n targets
+    attacks the same targets with the same range queries as a run with -c n. Only the time limit makes the number of
+    targets depend on the speed of the machine.
+
+    @param attackerInstance: An uninitialized Attacker, as returned by getAttackerFor(attID)
+    @param generatorInstance: An uninitialized Generator, as returned by getGeneratorFor(genID)
+    @param context: The var.Context.RunContext of the run
+    @param histogram: The util.Statistics.Histogram the results are added to by the consumer (see collectResults)
+    @param round_size: The number of targets attacked per round
+    @return: A generator yielding (domain, repetition, result of the attacker)-tuples, similar to iterAttackList
+    """
+    z = util.Statistics.getQuantile(var.Config.CONFIDENCE)
+    rng = context.getRandom(-1)
+    skipped = {}    # Number of range queries generated for each target in the previous rounds
+    start = time.time()
+    attacked = 0
+    while True:
+        number = round_size
+        if var.Config.MAXTARGETS > 0:
+            number = min(number, var.Config.MAXTARGETS - attacked)
+        target_list = chooseTargets(number, rng)
+        repetitions = var.Context.getRepetitions(target_list, skipped)
+        for result in iterAttack(attackerInstance, generatorInstance, target_list, repetitions):
+            yield result
+        for target in target_list:
+            skipped[target] = skipped.get(target, 0) + 1
+        attacked += number
+
+        # Check the stopping rule, after the consumer has added all results of the round to the histogram
+        width, pattern_length = histogram.getWidestInterval(z, var.Config.CIMINSHARE)
+        if width <= var.Config.CI:
+            reason = "confidence intervals reached"
+        elif var.Config.MAXTARGETS > 0 and attacked >= var.Config.MAXTARGETS:
+            reason = "target limit reached"
+        elif var.Config.MAXTIME > 0 and time.time() - start >= var.Config.MAXTIME:
+            reason = "time limit reached"
+        else:
+            if var.Config.VERBOSE:
+                print "%i targets, widest confidence interval %.4f (M=%s)" % (attacked, width, pattern_length or "all")
+            continue
+        if not var.Config.QUIET:
+            print "Stopped after %i targets, %s: widest %g%% confidence interval %.4f (M=%s)" \
+                % (attacked, reason, 100 * var.Config.CONFIDENCE, width, pattern_length or "all")
+        return
+
+
+def iterStratified(attackerInstance, generatorInstance, context, histogram, number):
+    """Attack targets chosen by stratified sampling over their pattern lengths
+
+    The targets are allocated to the pattern lengths according to var.Config.STRATIFY (see data.Strata). For the Neyman
+    allocation, a pilot sample of var.Config.PILOT targets per pattern length is attacked first, the rest of the targets
+    are allocated using the standard deviations of its results.
+
+    @param attackerInstance: An uninitialized Attacker, as returned by getAttackerFor(attID)
+    @param generatorInstance: An uninitialized Generator, as returned by getGeneratorFor(genID)
+    @param context: The var.Context.RunContext of the run
+    @param histogram: The util.Statistics.Histogram the results are added to by the consumer (see collectResults)
+    @param number: The total number of targets, including the pilot sample
+    @return: A generator yielding (domain, repetition, result of the attacker)-tuples, similar to iterAttackList
+    """
+    rng = context.getRandom(-1)
+    strata = data.Strata.getStrata()
+    deviations = None
+    taken = {}      # Number of targets drawn from each stratum by the pilot sample
+    skipped = {}    # Number of range queries generated for each target by the pilot sample
+    pilot_list = []
+    if var.Config.STRATIFY == "neyman": # Estimate the standard deviations of the strata
+        caps = dict((length, var.Config.PILOT if var.Config.REPLACE else min(var.Config.PILOT, strata[length]))
+                    for length in strata)
+        taken = data.Strata.allocate(number, dict((length, 1) for length in strata), caps)
+        pilot_list = data.Strata.chooseTargets(taken, var.Config.REPLACE, None, rng)
+        if var.Config.VERBOSE:
+            print "Pilot sample: %i targets" % len(pilot_list)
+        for result in iterAttack(attackerInstance, generatorInstance, pilot_list):
+            yield result
+        for target in pilot_list:
+            skipped[target] = skipped.get(target, 0) + 1
+        deviations = data.Strata.getDeviations(histogram.seperateSum)
+    allocation = data.Strata.getAllocation(var.Config.STRATIFY, number - len(pilot_list), strata, var.Config.REPLACE,
+                                           deviations, taken)
+    if var.Config.VERBOSE:
+        print "Allocation (M: targets): " + ", ".join("%i: %i" % (length, allocation[length] + taken.get(length, 0))
+                                                      for length in sorted(allocation))
+    target_list = data.Strata.chooseTargets(allocation, var.Config.REPLACE, set(pilot_list), rng)
+    repetitions = var.Context.getRepetitions(target_list, skipped)
+    for result in iterAttack(attackerInstance, generatorInstance, target_list, repetitions):
+        yield result
+
+
+def collectResults(attackResults, checkpoint=None, histogram=None):
+    """Collect results
+
+    Consume the results of an attack one by one, adding each to the statistics and, if var.Config.STREAM is set, writing
+    it to that result file. Unless var.Config.STAT is set, each result is also validated like in validateResults. Neither
+    the results nor the candidate lists are kept, so the memory needed does not depend on the number of targets.
+
+    If a checkpoint is given, the results are added to it (see util.Checkpoint.Checkpoint.add) instead of the histogram,
+    and the checkpoint is saved periodically, as well as
+    when the attack is interrupted. It is removed once all results have been collected. When a run is resumed, the result
+    file is cut to the size saved in the checkpoint before appending, so records written after the last checkpoint of a
+    crashed run do not appear twice.
+
+    @param attackResults: An iterable of (domain, repetition, result)-tuples, as returned by iterAttackList or
+        iterAttackParallel
+    @param checkpoint: A util.Checkpoint.Checkpoint instance, or None
+    @param histogram: The util.Statistics.Histogram to add the results to, or None for a new one (ignored if a checkpoint
+        is given, its histogram is used)
+    @return: Two dictionaries, like generateStats
+    """
+    if checkpoint is not None:
+        histogram = checkpoint.histogram
+    elif histogram is None:
+        histogram = util.Statistics.Histogram()
+    sink = None
+    if var.Config.STREAM: # Append to the result file if this run continues a previous one
+        resumed = checkpoint is not None and len(checkpoint.completed) > 0
+        sink = util.Stream.JSONLSink(var.Config.STREAM, var.Config.CANDIDATES, resumed,
+                                     checkpoint.streamOffset if resumed else None)
+        if checkpoint is not None:
+            checkpoint.setStream(sink)
+    try:
+        for domain, rep, result in attackResults:
+            if not var.Config.STAT and domain not in result:
+                sys.stderr.write("[ERROR] " + data.DB.getHostname(domain) + " not in results\n")
+                sys.stderr.write("        Previously checked " + str(histogram.count()) + " correct results.\n")
+                sys.stderr.flush()
+                util.Error.printErrorAndExit("Something went wrong. Exiting!")
+            pattern_length = data.DB.getPatternLengthForHost(domain)
+            if sink is not None:
+                sink.write(domain, pattern_length, result)
+            if checkpoint is not None: # Counts the result and marks the target as completed in one step
+                checkpoint.add(domain, rep, pattern_length, util.Statistics.getResultCount(result))
+            else:
+                histogram.add(pattern_length, util.Statistics.getResultCount(result))
+    except (Exception, KeyboardInterrupt):
+        if checkpoint is not None:
+            checkpoint.save()
+        raise
+    finally:
+        if sink is not None:
+            sink.close()
+    if checkpoint is not None:
+        checkpoint.remove()
+    return histogram.seperateSum, histogram.overallSum
+
+
+def collectReduced(reducedResults, checkpoint=None, histogram=None):
+    """Collect the statistics of results that have been reduced by the workers
+
+    Works like collectResults, but for the chunks of iterAttackReduced: the histograms of the chunks are merged, the
+    results have already been validated by the workers.
+
+    @param reducedResults: An iterable of ((domain, repetition)-tuples, histogram, invalid domain or None)-tuples, as
+        returned by iterAttackReduced
+    @param checkpoint: A util.Checkpoint.Checkpoint instance, or None
+    @param histogram: The util.Statistics.Histogram to add the results to, or None for a new one (ignored if a checkpoint
+        is given, its histogram is used)
+    @return: Two dictionaries, like generateStats
+    """
+    if checkpoint is not None:
+        histogram = checkpoint.histogram
+    elif histogram is None:
+        histogram = util.Statistics.Histogram()
+    try:
+        for domains, chunkHistogram, invalid in reducedResults:
+            if invalid is not None:
+                sys.stderr.write("[ERROR] " + data.DB.getHostname(invalid) + " not in results\n")
+                sys.stderr.write("        Previously checked " + str(histogram.count()) + " correct results.\n")
+                sys.stderr.flush()
+                util.Error.printErrorAndExit("Something went wrong. Exiting!")
+            if checkpoint is not None: # Counts the results and marks the targets as completed in one step
+                checkpoint.addChunk(domains, chunkHistogram)
+            else:
+                histogram.merge(chunkHistogram)
+    except (Exception, KeyboardInterrupt):
+        if checkpoint is not None:
+            checkpoint.save()
+        raise
+    if checkpoint is not None:
+        checkpoint.remove()
+    return histogram.seperateSum, histogram.overallSum
+
+
+def validateResults(attackResults):
     """Validate results
 
     Validated the results of a finished attack, checking if the correct Domain is included in the results.
 
-    @param attackResultDictionary: A result dictionary, as returned by attackList or attackParallel
+    Results are stored as host IDs, they are translated back to hostnames for the output.
+
+    @param attackResults: A list of (domain, result)-tuples, as returned by attackList or attackParallel
     @return True if the correct result was always found, terminates program otherwise.
     """
     print "Validating Results..."
     i = 0
-    for domain in attackResultDictionary:
-        if domain not in attackResultDictionary[domain]:
-            sys.stderr.write("[ERROR] " + domain + " not in results\n")
+    for domain, result in attackResults:
+        if domain not in result:
+            sys.stderr.write("[ERROR] " + data.DB.getHostname(domain) + " not in results\n")
             sys.stderr.write("        Previously checked " + str(i) + " correct results.\n")
             sys.stderr.flush()
             return False
         else:
             if not var.Config.QUIET:
-                print "Target:       " + domain
-                print "# possible:   " + str(len(attackResultDictionary[domain]))
+                print "Target:       " + data.DB.getHostname(domain)
+                print "# possible:   " + str(len(result))
                 print "len(pattern): " + str(data.DB.getPatternLengthForHost(domain))
                 print "=============================="
             i += 1
     return True
 
 
-def generateStats(attackResultDictionary):
+def generateStats(attackResults):
     """Generate stats
 
-    Generate statistics for a provided attackResultDictionary.
+    Generate statistics for the provided attackResults. Every result is counted, also those of targets that have been
+    chosen more than once, so the statistics are the same as the ones collectResults computes for the same targets.
 
-    @param attackResultDictionary: A result Dictionary, as returned by attackList or attackParallel
+    @param attackResults: A list of (domain, result)-tuples, as returned by attackList or attackParallel
     @return: Two dictionaries, showing the number of patterns with a specific number of results
     """
-    seperateSum = {}
-    overallSum = {}
-    for domain in attackResultDictionary:
-        pattern_length = data.DB.getPatternLengthForHost(domain)
-        ard_len = len(attackResultDictionary[domain])
-        try:
-            seperateSum[pattern_length]
-        except KeyError:
-            seperateSum[pattern_length] = {}
-        try:
-            seperateSum[pattern_length][ard_len] += 1
-        except KeyError:
-            seperateSum[pattern_length][ard_len] = 1
-        try:
-            overallSum[ard_len] += 1
-        except KeyError:
-            overallSum[ard_len] = 1
-    return seperateSum, overallSum
-
-
-def printStats(seperateSum, overallSum):
+    histogram = util.Statistics.Histogram()
+    for domain, result in attackResults:
+        histogram.add(data.DB.getPatternLengthForHost(domain), util.Statistics.getResultCount(result))
+    return histogram.seperateSum, histogram.overallSum
+
+
+def printStats(seperateSum, overallSum, context=None):
     """Print stats
 
     Write the statistics generated by generateStats() to a number of Files, filenames formatted to contain all relevant information
@@ -223,15 +551,16 @@ def printStats(seperateSum, overallSum):
         of attacks on Patterns of the length pattern_length that returned num_of_attack_results results.
     @param overallSum: A statistics dictionary where overallSum[num_of_attack_results] contains the number of results of attacks on
         Patterns of any length that returned num_of_attack_results results.
+    @param context: The var.Context.RunContext of the run (None for the run described by var.Config)
     """
-    with util.FileManagement.openStatFile(0) as fo:
+    with util.FileManagement.openStatFile(0, context) as fo:
         for i in range(1, max(overallSum)+1, 1):
             try:
                 fo.write("%i %i\n" % (i, overallSum[i]))
             except KeyError:
                 fo.write("%i %i\n" % (i, 0))
     for k in seperateSum:
-        with util.FileManagement.openStatFile(k) as fo:
+        with util.FileManagement.openStatFile(k, context) as fo:
             for i in range(1, max(seperateSum[k])+1, 1):
                 try:
                     fo.write("%i %i\n" % (i, seperateSum[k][i]))
@@ -239,6 +568,210 @@ def printStats(seperateSum, overallSum):
                     fo.write("%i %i\n" % (i, 0))
 
 
+def runAttack(context, args):
+    """Run the attack for one run context
+
+    Chooses the targets, generates range queries for them and attacks them, and validates the results and writes the
+    statistics of the run as requested.
+
+    @param context: The var.Context.RunContext of the run. The client database must already be partitioned accordingly.
+    @param args: The parsed command line arguments (for the choice of targets and --resume)
+    """
+    # Load the checkpoint of an interrupted run
+    checkpoint = None
+    if var.Config.CHECKPOINT > 0 or args.resume:
+        checkpoint = util.Checkpoint.Checkpoint(util.FileManagement.getCheckpointPath(context), var.Config.CHECKPOINT,
+                                                context.seed)
+        if args.resume and checkpoint.load():
+            if checkpoint.seed is not None and checkpoint.seed != context.seed:
+                if args.seed is not None:
+                    util.Error.printErrorAndExit("The checkpoint has been made with --seed " + str(checkpoint.seed))
+                context.seed = var.Config.SEED = checkpoint.seed # Continue with the targets of the interrupted run
+            if not var.Config.QUIET:
+                print "Resuming after %i completed targets (seed %s)..." % (len(checkpoint.completed), checkpoint.seed)
+        if var.Config.CHECKPOINT <= 0: # Resume without saving new checkpoints
+            checkpoint.interval = float("inf")
+
+    # Choose targets
+    repetitions = None  # Repetition numbers of the targets, if some of their occurrences have been skipped
+    with util.Profile.phase("targets"):
+        target_list = []
+        if args.target != "":
+            target = data.DB.getHostID(args.target)
+            if not data.DB.isValidTarget(target):
+                util.Error.printErrorAndExit(args.target + " is not a valid target")
+            target_list.append(target)
+        elif var.Config.CI > 0 or var.Config.STRATIFY:
+            pass # The targets are chosen by iterAdaptive or iterStratified
+        elif args.attack_all:
+            target_list = data.DB.getAllPossibleTargets()
+            if checkpoint is not None and checkpoint.completed: # Skip the targets completed before the interruption
+                completed = set(target for target, _ in checkpoint.completed)
+                target_list = [target for target in target_list if target not in completed]
+        elif checkpoint is not None and checkpoint.completed and checkpoint.seed is None:
+            # Checkpoint without a seed, the targets of the interrupted run can not be chosen again
+            target_list = chooseTargets(max(args.cnt - len(checkpoint.completed), 0), context.getRandom(-1))
+        else:
+            target_list = chooseTargets(args.cnt, context.getRandom(-1), var.Config.REPLACE)
+            if checkpoint is not None and checkpoint.completed: # Skip the targets completed before the interruption
+                # The occurrences of a target are completed in any order by multiple threads, so they are told apart by
+                # their repetition numbers
+                completed = set(checkpoint.completed)
+                unfinished = [(target, rep) for target, rep in zip(target_list, var.Context.getRepetitions(target_list))
+                              if (target, rep) not in completed]
+                target_list = [target for target, _ in unfinished]
+                repetitions = [rep for _, rep in unfinished]
+
+    if args.record:
+        recordCorpus(context, target_list, args.record)
+        return
+
+    # Get Generators and Attackers
+    if args.compare:
+        generatorInstance = getCombinedGeneratorFor(context.mode, context)
+        attackerInstance = getCombinedAttackerFor(context.mode)
+    else:
+        generatorInstance = getGeneratorFor(context.mode, context)
+        attackerInstance = getAttackerFor(context.mode)
+
+    if not var.Config.QUIET:
+        print "Beginning Attack..."
+
+    # Begin Attack procedure
+    util.Profile.startProfiler()
+    reduced = var.Config.REDUCE and var.Config.THREADS > 1 # The workers only return histograms
+    if var.Config.STREAM or checkpoint is not None or var.Config.CI > 0 or var.Config.STRATIFY or reduced:
+        with util.Profile.phase("attack"): # Validation and statistics happen while the results are collected
+            histogram = checkpoint.histogram if checkpoint is not None else util.Statistics.Histogram()
+            if var.Config.CI > 0: # Adaptive run, stopped based on the histogram
+                attackResults = iterAdaptive(attackerInstance, generatorInstance, context, histogram, args.cnt)
+            elif var.Config.STRATIFY: # The choice of the Neyman allocation depends on the results of the pilot sample
+                attackResults = iterStratified(attackerInstance, generatorInstance, context, histogram, args.cnt)
+            else:
+                attackResults = iterAttack(attackerInstance, generatorInstance, target_list, repetitions)
+            if reduced:
+                seperateSum, overallSum = collectReduced(attackResults, checkpoint, histogram)
+            else:
+                seperateSum, overallSum = collectResults(attackResults, checkpoint, histogram)
+        util.Profile.dumpProfiler("main")
+        with util.Profile.phase("stats"):
+            if var.Config.STAT or var.Config.VERBOSE:
+                printStats(seperateSum, overallSum, context)
+                if var.Config.STRATIFY: # The overall statistics have to be reweighted
+                    with open(util.FileManagement.getWeightsPath(context), "w") as fo:
+                        data.Strata.writeWeights(fo, var.Config.STRATIFY, data.Strata.getStrata(), seperateSum)
+        return
+    with util.Profile.phase("attack"):
+        if var.Config.THREADS > 1:
+            attackResult = attackParallel(attackerInstance, generatorInstance, target_list)
+        else:
+            attackResult = attackList(attackerInstance, generatorInstance, target_list)
+    util.Profile.dumpProfiler("main")
+    if args.compare: # Split the results of the combined attacker by mode
+        for i, mode in enumerate(getComparedModes(context.mode)):
+            if not var.Config.QUIET:
+                print "Mode %i:" % mode
+            writeResults([(domain, results[i]) for domain, results in attackResult],
+                         var.Context.RunContext(mode, context.rqsize, context.dbsplit, context.seed))
+        return
+    writeResults(attackResult, context)
+
+
+def recordCorpus(context, target_list, path):
+    """Generate range queries and write them to a corpus file
+
+    The range queries are generated in the format of the fully distinguishable blocks modes, from which the formats of
+    all other modes with the same generation strategy can be derived.
+
+    @param context: The var.Context.RunContext of the run
+    @param target_list: The list of targets
+    @param path: The path of the corpus file
+    """
+    generatorInstance = getGeneratorFor(getComparedModes(context.mode)[2], context)
+    if not var.Config.QUIET:
+        print "Recording range queries..."
+    with util.Profile.phase("record"):
+        with data.Corpus.Writer(path, var.Config.INFILE, context.mode, context.rqsize, context.dbsplit) as corpus:
+            if var.Config.THREADS > 1:
+                rqs = iterAttackParallel(data.Corpus.Passthrough, generatorInstance, target_list)
+            else:
+                rqs = iterAttackList(data.Corpus.Passthrough, generatorInstance, target_list)
+            for domain, _, blocks in rqs:
+                corpus.write(domain, blocks)
+
+
+def replayCorpus(args, part, parts):
+    """Attack the range queries of a corpus file
+
+    The attack model is taken from -m, the generation strategy, range query size and client database size from the
+    corpus. The results are validated and their statistics written like the results of a normal run.
+
+    @param args: The parsed command line arguments
+    @param part: The index of the part of the corpus to attack
+    @param parts: The number of parts the corpus is split into
+    """
+    with util.Profile.phase("targets"):
+        reader = data.Corpus.Reader(args.replay, var.Config.INFILE, part, parts)
+    modes = getComparedModes(reader.mode)
+    if args.compare:
+        shape = generate.DRQ.toAll
+        attackerInstance = functools.partial(attacker.Pattern.Combined, [getAttackerFor(mode) for mode in modes])
+    else:
+        model = (args.mode - 1) % 3
+        shape = [generate.DRQ.toNDB, generate.DRQ.toDFB, generate.DRQ.toFDB][model]
+        modes = [modes[model]] # The mode with the generation strategy of the corpus and the attack model of -m
+        attackerInstance = getAttackerFor(modes[0])
+    generatorInstance = functools.partial(data.Corpus.Replay, reader, shape)
+    if not var.Config.QUIET:
+        print "Replaying %i range queries..." % len(reader)
+
+    # The corpus is attacked by index, the results are translated back to the targets
+    indices = range(len(reader))
+    util.Profile.startProfiler()
+    if var.Config.STREAM:
+        context = var.Context.RunContext(modes[0], reader.rqsize, reader.dbsplit)
+        with util.Profile.phase("attack"):
+            if var.Config.THREADS > 1:
+                attackResults = iterAttackParallel(attackerInstance, generatorInstance, indices)
+            else:
+                attackResults = iterAttackList(attackerInstance, generatorInstance, indices)
+            seperateSum, overallSum = collectResults((reader.getTarget(index), rep, result)
+                                                     for index, rep, result in attackResults)
+        util.Profile.dumpProfiler("main")
+        with util.Profile.phase("stats"):
+            if var.Config.STAT or var.Config.VERBOSE:
+                printStats(seperateSum, overallSum, context)
+        return
+    with util.Profile.phase("attack"):
+        if var.Config.THREADS > 1:
+            attackResult = attackParallel(attackerInstance, generatorInstance, indices)
+        else:
+            attackResult = attackList(attackerInstance, generatorInstance, indices)
+    util.Profile.dumpProfiler("main")
+    attackResult = [(reader.getTarget(index), result) for index, result in attackResult]
+    for i, mode in enumerate(modes):
+        if not var.Config.QUIET and len(modes) > 1:
+            print "Mode %i:" % mode
+        results = attackResult if len(modes) == 1 else [(domain, result[i]) for domain, result in attackResult]
+        writeResults(results, var.Context.RunContext(mode, reader.rqsize, reader.dbsplit))
+
+
+def writeResults(attackResult, context):
+    """Validate the results of an attack and write their statistics, as requested
+
+    @param attackResult: A list of (domain, result)-tuples, as returned by attackList or attackParallel
+    @param context: The var.Context.RunContext of the run
+    """
+    with util.Profile.phase("validate"):
+        if not var.Config.STAT:
+            if not validateResults(attackResult):
+                util.Error.printErrorAndExit("Something went wrong. Exiting!")
+    with util.Profile.phase("stats"):
+        if var.Config.STAT or var.Config.VERBOSE:
+            seperateSum, overallSum = generateStats(attackResult)
+            printStats(seperateSum, overallSum, context)
+
+
 def main(argv=None):  # IGNORE:C0111
     """Main function
 
@@ -270,12 +803,41 @@ def main(argv=None):  # IGNORE:C0111
         parser.add_argument("-m", '--mode', dest="mode", help="Enable a specific mode of operation. See below for possible options. [default %(default)s]", default="1", choices=[1, 2, 3, 4, 5, 6], type=int)
         parser.add_argument('-s', '--size', dest="num", help="Size of the range query [default %(default)s]", default="50", type=int)
         parser.add_argument('-c', '--count', dest="cnt", help="Number of random targets to be tried [default %(default)s]", default="50", type=int)
+        parser.add_argument('--seed', dest="seed", metavar="NUM", help="Seed of the random number generators. Runs with the same seed attack the same targets with the same range queries, whatever the number of threads [default: a random seed, which is printed]", type=int, default=None)
+        parser.add_argument('--ci', dest="ci", metavar="WIDTH", help="Attack random targets in rounds of -c targets until the confidence intervals of all proportions of the k-definiteness histograms (overall and per pattern length) are at most WIDTH wide, instead of attacking -c targets once", type=float, default="0")
+        parser.add_argument('--confidence', dest="confidence", metavar="LEVEL", help="Confidence level of the intervals of --ci [default %(default)s]", type=float, default="0.95")
+        parser.add_argument('--ci-min-share', dest="ci_min_share", metavar="FRACTION", help="Ignore pattern lengths with less than FRACTION of the attacked targets when checking the intervals of --ci [default %(default)s]", type=float, default="0.01")
+        parser.add_argument('--max-targets', dest="max_targets", metavar="NUM", help="Stop --ci after NUM targets, even if the intervals are still too wide [default %(default)s for no limit]", type=int, default="0")
+        parser.add_argument('--max-time', dest="max_time", metavar="SEC", help="Stop --ci after the first round that ends more than SEC seconds after the start of the attack [default %(default)s for no limit]", type=float, default="0")
+        parser.add_argument('--stratify', dest="stratify", metavar="ALLOCATION", help="Choose the -c random targets by their pattern length, allocating them to the pattern lengths proportionally to their number of targets, equally, or by Neyman allocation after a pilot sample. The weights needed to reweight the overall statistics are written to weights.txt", choices=data.Strata.METHODS, default="")
+        parser.add_argument('--pilot', dest="pilot", metavar="NUM", help="Number of targets per pattern length in the pilot sample of --stratify neyman [default %(default)s]", type=int, default="10")
+        parser.add_argument('--no-replacement', dest="replace", action="store_false", help="Choose the random targets without replacement, so no target is attacked twice (at most all targets of the client database are attacked)")
         parser.add_argument('-p', '--partition', dest="partition", help="Number of Queries the Client should be allowed to use [default %(default)s for all queries]", default="-1", type=int)
+        parser.add_argument('--sweep', dest="sweep", metavar="SPEC", help="Run every combination of modes, sizes and partitions in SPEC (e.g. \"m=1..6;s=10,50;p=-1,2000\"), parsing the pattern file only once. Values that are not given are taken from -m, -s and -p. Implies --stat", type=str, default="")
+        parser.add_argument('--nested', dest="nested", action="store_true", help="Build the client databases of all partitions of --sweep as nested subsets from a single shuffle of the patterns, instead of partitioning independently for each size (the partitions differ from the ones without --nested)")
+        parser.add_argument('--compare', dest="compare", action="store_true", help="Generate each range query only once and attack it under all three attack models of the generation strategy of -m (modes 1-3 or 4-6), writing the statistics of each mode separately")
+        parser.add_argument('--record', dest="record", metavar="FILE", help="Only generate the range queries (in the format of mode 3 or 6, depending on -m) and write them to the corpus FILE, instead of attacking them")
+        parser.add_argument('--replay', dest="replay", metavar="FILE", help="Attack the range queries of the corpus FILE instead of generating new ones. The generation strategy, -s and -p are taken from the corpus, -m only selects the attack model")
+        parser.add_argument('--part', dest="part", metavar="K/N", help="With --replay, only attack the K-th of N equally large parts of the corpus (K = 1..N)", type=str, default="")
         parser.add_argument('-t', '--threads', dest="threads", help="Number of Threads used for processing [default %(default)s]", default="1", type=int)
+        parser.add_argument('--chunk', dest="chunk", metavar="NUM", help="Number of targets handed to a thread at once [default %(default)s to choose automatically]", default="0", type=int)
+        parser.add_argument('--count-only', dest="count_only", action="store_true", help="Only count the possible results of each attack instead of listing them, which is faster. The results can not be validated, implies --stat")
+        parser.add_argument('--cap', dest="cap", metavar="K", help="Stop counting the possible results of an attack once there are more than K, so the statistics only distinguish 1 to K and more than K (counted as K+1). Implies --count-only [default %(default)s for no cap]", type=int, default="0")
+        parser.add_argument('-e', '--engine', dest="engine", help="Attack engine for modes 1 and 4: set-based, or vectorized over batches of range queries with NumPy [default %(default)s]", default="set", choices=["set", "matrix"])
+        parser.add_argument('-b', '--batch', dest="batch", help="Number of range queries attacked at once by the matrix engine [default %(default)s]", default="64", type=int)
+        parser.add_argument('--flat', dest="flat", action="store_true", help="Keep the pattern database in flat arrays, so the threads do not copy it into their memory. Saves memory, but makes generating and attacking range queries slower (no effect with -t 1)")
+        parser.add_argument('--reduce', dest="reduce", action="store_true", help="Let the threads validate their results and reduce them to the statistics, instead of sending every list of candidates back (no effect with -t 1)")
         group2 = parser.add_mutually_exclusive_group()
         group2.add_argument('--target', dest="target", metavar="url", help="Attack this domain", type=str, default="")
         group2.add_argument('--all', dest="attack_all", action="store_true", help="Attack all possible targets (may take a long time). Implies -q, --stat")
         parser.add_argument('--stat', dest="stat", help="Show statistics about the accuracy of the algorithm", action="store_true")
+        parser.add_argument('--stream', dest="stream", metavar="FILE", help="Write the result of each attack to FILE (one JSON object per line) as soon as it is available, instead of keeping all results in memory", type=str, default="")
+        parser.add_argument('--candidates', dest="candidates", action="store_true", help="Include the list of candidates in the results written by --stream")
+        parser.add_argument('--checkpoint', dest="checkpoint", metavar="SEC", help="Save the completed targets and statistics every SEC seconds, so the run can be resumed [default %(default)s: 300 with --all, never otherwise]", default="-1", type=int)
+        parser.add_argument('--resume', dest="resume", action="store_true", help="Resume an interrupted run from its checkpoint, skipping all completed targets")
+        parser.add_argument('--no-cache', dest="cache", action="store_false", help="Always parse the pattern file, do not load or write its compiled cache (FILE.cache)")
+        parser.add_argument('--profile', dest="profile", action="store_true", help="Print the time and memory used by each phase of the run, and the time spent on generating range queries and on attacking them")
+        parser.add_argument('--profile-dump', dest="profile_dump", metavar="DIR", help="Write cProfile output of the attack phase of every process to DIR. Implies --profile", type=str, default="")
         parser.add_argument("file", help="select pattern file.")
         group1 = parser.add_mutually_exclusive_group()
         group1.add_argument("-v", "--verbose", dest="verbose", action="store_true", help="enable verbose output (show more information).")
@@ -292,46 +854,135 @@ def main(argv=None):  # IGNORE:C0111
         var.Config.THREADS = args.threads
         var.Config.MODENUM = args.mode
         var.Config.DBSPLIT = args.partition
+        var.Config.CHUNKSIZE = args.chunk
+        var.Config.STREAM = args.stream
+        var.Config.CANDIDATES = args.candidates
+        var.Config.CHECKPOINT = args.checkpoint
+        var.Config.CACHE = args.cache
+        var.Config.CI = args.ci
+        var.Config.CONFIDENCE = args.confidence
+        var.Config.CIMINSHARE = args.ci_min_share
+        var.Config.MAXTARGETS = args.max_targets
+        var.Config.MAXTIME = args.max_time
+        var.Config.REDUCE = args.reduce
+        var.Config.FLAT = args.flat
+        var.Config.ENGINE = args.engine
+        var.Config.BATCH = args.batch
+        if var.Config.ENGINE == "matrix" and not attacker.Pattern.NUMPY:
+            util.Error.printErrorAndExit("Main: -e matrix requires NumPy")
+        if var.Config.BATCH < 1:
+            util.Error.printErrorAndExit("Main: -b must be at least 1")
+        var.Config.CAP = args.cap
+        var.Config.COUNT = args.count_only or args.cap > 0
+        if var.Config.COUNT:
+            var.Config.STAT = True
+        var.Config.STRATIFY = args.stratify
+        var.Config.REPLACE = args.replace
+        var.Config.PILOT = args.pilot
+        var.Config.SEED = args.seed if args.seed is not None else random.SystemRandom().randrange(2 ** 63)
         if args.attack_all:
             var.Config.STAT = True
             var.Config.VERBOSE = False
             var.Config.QUIET = True
+            if var.Config.CHECKPOINT == -1 and not (args.sweep or args.compare or args.record or args.replay):
+                var.Config.CHECKPOINT = 300
+        if args.sweep:
+            if var.Config.STREAM or var.Config.CHECKPOINT > 0 or args.resume:
+                util.Error.printErrorAndExit("Main: --sweep can not be combined with --stream, --checkpoint or --resume")
+            var.Config.STAT = True
+        if args.compare and (var.Config.STREAM or var.Config.CHECKPOINT > 0 or args.resume):
+            util.Error.printErrorAndExit("Main: --compare can not be combined with --stream, --checkpoint or --resume")
+        if args.record and args.replay:
+            util.Error.printErrorAndExit("Main: --record can not be combined with --replay")
+        if args.record and (args.sweep or args.compare or var.Config.STREAM or var.Config.CHECKPOINT > 0 or args.resume):
+            util.Error.printErrorAndExit("Main: --record can not be combined with --sweep, --compare, --stream, --checkpoint or --resume")
+        if args.replay and (args.sweep or var.Config.CHECKPOINT > 0 or args.resume):
+            util.Error.printErrorAndExit("Main: --replay can not be combined with --sweep, --checkpoint or --resume")
+        if var.Config.CI > 0:
+            if args.target or args.attack_all or args.compare or args.record or args.replay or var.Config.CHECKPOINT > 0 or args.resume:
+                util.Error.printErrorAndExit("Main: --ci can not be combined with --target, --all, --compare, --record, --replay, --checkpoint or --resume")
+            if not 0 < var.Config.CONFIDENCE < 1 or args.cnt < 1:
+                util.Error.printErrorAndExit("Main: --ci requires 0 < --confidence < 1 and -c >= 1")
+        elif var.Config.MAXTARGETS > 0 or var.Config.MAXTIME > 0:
+            util.Error.printErrorAndExit("Main: --max-targets and --max-time require --ci")
+        if var.Config.CI > 0 and (var.Config.STRATIFY or not var.Config.REPLACE):
+            util.Error.printErrorAndExit("Main: --ci can not be combined with --stratify or --no-replacement")
+        if var.Config.STRATIFY and (args.target or args.attack_all or args.compare or args.record or args.replay or var.Config.CHECKPOINT > 0 or args.resume):
+            util.Error.printErrorAndExit("Main: --stratify can not be combined with --target, --all, --compare, --record, --replay, --checkpoint or --resume")
+        if var.Config.REDUCE and (var.Config.STREAM or args.compare or args.record or args.replay):
+            util.Error.printErrorAndExit("Main: --reduce can not be combined with --stream, --compare, --record or --replay")
+        if var.Config.COUNT and (var.Config.CANDIDATES or args.record):
+            util.Error.printErrorAndExit("Main: --count-only and --cap can not be combined with --candidates or --record")
+        part, parts = 0, 1
+        if args.part:
+            try:
+                part, parts = [int(value) for value in args.part.split("/")]
+                part -= 1
+            except ValueError:
+                parts = 0
+            if not args.replay or not 0 <= part < parts:
+                util.Error.printErrorAndExit("Main: --part expects K/N with 1 <= K <= N and requires --replay")
+
+        # Get the runs to be done
+        contexts = [var.Context.fromConfig()]
+        if args.sweep:
+            try:
+                contexts = var.Context.parseSweep(args.sweep, args.mode, args.num, args.partition, var.Config.SEED)
+            except ValueError, e:
+                util.Error.printErrorAndExit("Main: " + str(e))
+        if args.compare: # One run covers all modes of a generation strategy
+            unique = []
+            seen = set()
+            for context in contexts:
+                context.mode = getComparedModes(context.mode)[0]
+                if (context.mode, context.rqsize, context.dbsplit) not in seen:
+                    seen.add((context.mode, context.rqsize, context.dbsplit))
+                    unique.append(context)
+            contexts = unique
+
+        if args.seed is None and not args.replay and not args.resume and not var.Config.QUIET:
+            print "Seed: %i" % var.Config.SEED
+
+        if args.profile or args.profile_dump:
+            util.Profile.enable(args.profile_dump)
 
         # Parse input file
-        parse.Pattern.parse()
-
-        # Partition database according to value of -p
-        qsize = data.DB.createDatabasePartition(var.Config.DBSPLIT)
-        if qsize != var.Config.DBSPLIT and var.Config.DBSPLIT != -1:
-            sys.stderr.write("[WARN] Main: Client DB contains only %i Queries, should contain %i.\n" % (qsize, var.Config.DBSPLIT))
-
-        # Choose targets
-        target_list = []
-        if args.target != "":
-            target_list.append(args.target)
-        elif args.attack_all:
-            target_list = data.DB.getAllPossibleTargets()
-        else:
-            target_list = chooseTargets(args.cnt)
-
-        # Get Generators and Attackers
-        generatorInstance = getGeneratorFor(args.mode)
-        attackerInstance = getAttackerFor(args.mode)
-
-        if not var.Config.QUIET:
-            print "Beginning Attack..."
-
-        # Begin Attack procedure
-        if var.Config.THREADS > 1:
-            attackResult = attackParallel(attackerInstance, generatorInstance, target_list)
-        else:
-            attackResult = attackList(attackerInstance, generatorInstance, target_list)
-        if not var.Config.STAT:
-            if not validateResults(attackResult):
-                util.Error.printErrorAndExit("Something went wrong. Exiting!")
-        if var.Config.STAT or var.Config.VERBOSE:
-            seperateSum, overallSum = generateStats(attackResult)
-            printStats(seperateSum, overallSum)
+        with util.Profile.phase("parse"):
+            parse.Pattern.parse()
+        if var.Config.ENGINE == "matrix": # Built once, before the workers are forked
+            with util.Profile.phase("matrix"):
+                data.DB.buildIncidenceMatrix()
+
+        if args.replay: # The range queries have already been generated, no partition is needed
+            if var.Config.FLAT and var.Config.THREADS > 1:
+                data.DB.flatten()
+            replayCorpus(args, part, parts)
+            util.Profile.report()
+            return 0
+
+        if args.nested: # Prepare all partitions at once
+            with util.Profile.phase("partition"):
+                data.DB.buildNestedPartitions([context.dbsplit for context in contexts])
+
+        partition = None
+        for context in contexts:
+            if context.dbsplit != partition:
+                # Partition database according to value of -p
+                with util.Profile.phase("partition"):
+                    if args.nested:
+                        qsize = data.DB.selectNestedPartition(context.dbsplit)
+                    else:
+                        qsize = data.DB.createDatabasePartition(context.dbsplit)
+                    if var.Config.FLAT and var.Config.THREADS > 1 and not data.DB.FLAT:
+                        data.DB.flatten() # Keep the forked workers from copying the databases (see data.DB.flatten)
+                        # Once flat, every new partition is flattened by the partitioning itself
+                if qsize != context.dbsplit and context.dbsplit != -1:
+                    sys.stderr.write("[WARN] Main: Client DB contains only %i Queries, should contain %i.\n" % (qsize, context.dbsplit))
+                partition = context.dbsplit
+            if args.sweep and not var.Config.QUIET:
+                print "Sweep: " + repr(context)
+            runAttack(context, args)
+        util.Profile.report()
         return 0
 
     except KeyboardInterrupt:
@@ -5,11 +5,26 @@ Implements different versions of the Attack. See Class Documentations for furthe
 
 Each class provides at least one function, 'attack', which is used to run a simulated attack on the provided data.
 The attack functions take different inputs, but will always return a list of possible results.
+All queries and results are host IDs, as stored in data.DB.
+Each class also provides a function 'count', which only returns the number of possible results. It does not build the
+list of results and stops once the number exceeds an optional cap. Use getCounter to get a variant of an attacker whose
+attack functions only count.
+Attackers that can attack many range queries at once also provide 'attackBatch' and 'countBatch', which take a list of
+range queries and return a list of results.
+
+NDBPatternMatrix needs NumPy, which is optional: the module can be used without it, NUMPY is False then.
 
 @author: Max Maass
 '''
 from data import DB
 import math
+try:
+    import numpy
+    NUMPY = True
+except ImportError:
+    NUMPY = False
+
+MATRIX = {}     # NumPy copies of the incidence matrix of the patterns ("indptr", "indices", "length"), see NDBPatternMatrix
 
 
 class NDBPattern():
@@ -31,11 +46,123 @@ class NDBPattern():
         for element in rq: # Iterate through all elements (queries) of the given range query
             if DB.isValidTarget(element): # If the current element is the beginning of a pattern...
                 # This checks if the pattern of the current element is a subset of the range query
-                inter = rq & DB.getPatternForHost(element) 
-                if len(inter) == DB.getPatternLengthForHost(element):
+                if rq.issuperset(DB.getPatternUnchecked(element)):
                     res.append(element)
         return res
 
+    def count(self, rq, cap=None):
+        """Count the possible results of a given Range Query
+
+        @param rq: A Range Query, as returned by generate.DRQ
+        @param cap: Stop counting once the number of possible results exceeds cap (None to count all of them)
+        @return: The number of possible results, or cap+1 if there are more than cap
+        """
+        number = 0
+        isValidTarget = DB.isValidTarget
+        getPattern = DB.getPatternUnchecked
+        issuperset = rq.issuperset
+        for element in rq:
+            # issuperset compares the sizes of two sets first, so patterns longer than the range query are rejected at no
+            # extra cost (not after DB.flatten, which returns the patterns as arrays)
+            if isValidTarget(element) and issuperset(getPattern(element)):
+                number += 1
+                if cap is not None and number > cap:
+                    break
+        return number
+
+
+class NDBPatternMatrix(NDBPattern):
+    """No distinguishable blocks pattern attack, vectorized over batches of range queries
+
+    Makes the same assumptions and returns the same results, in the same order, as NDBPattern, but attacks a whole batch
+    of range queries with a few NumPy operations instead of a Python loop per query. The patterns are taken from the
+    incidence matrix in CSR format (see DB.buildIncidenceMatrix). The batch is encoded as the sorted keys
+    rq_index * len(DB.NAMES) + query of all its queries. Every query of a range query that is a valid target is a
+    candidate: the row of the candidate is gathered from the matrix and each of its columns looked up in the keys of
+    its range query. A candidate is a possible result if its number of hits equals its pattern length.
+    """
+
+    def __init__(self):
+        """Initialize
+
+        Builds the incidence matrix and its NumPy copy, if that has not happened yet.
+        """
+        DB.buildIncidenceMatrix()
+        if len(MATRIX.get("indptr", ())) != len(DB.INDPTR): # The copy is made once per database
+            MATRIX["indptr"] = numpy.frombuffer(DB.INDPTR, dtype=numpy.int_).copy()
+            MATRIX["indices"] = numpy.frombuffer(DB.INDICES, dtype=numpy.int_).copy()
+            MATRIX["length"] = numpy.diff(MATRIX["indptr"])
+
+    def attack(self, rq):
+        """Attack a given Range Query using the assumption from the class description.
+
+        @param rq: A Range Query, as returned by generate.DRQ
+        @return: list of possible results
+        """
+        return self.attackBatch([rq])[0]
+
+    def count(self, rq, cap=None):
+        """Count the possible results of a given Range Query
+
+        @param rq: A Range Query, as returned by generate.DRQ
+        @param cap: Limit the number to cap+1 (None to count all of them)
+        @return: The number of possible results, or cap+1 if there are more than cap
+        """
+        return self.countBatch([rq], cap)[0]
+
+    def attackBatch(self, rqs):
+        """Attack a batch of Range Queries using the assumption from the class description.
+
+        @param rqs: A list of Range Queries, as returned by generate.DRQ
+        @return: A list containing the list of possible results for each range query, in the same order
+        """
+        rows, targets = self.getMatches(rqs)
+        res = [[] for _ in rqs]
+        for row, target in zip(rows.tolist(), targets.tolist()):
+            res[row].append(target)
+        return res
+
+    def countBatch(self, rqs, cap=None):
+        """Count the possible results of a batch of Range Queries
+
+        @param rqs: A list of Range Queries, as returned by generate.DRQ
+        @param cap: Limit the numbers to cap+1 (None to count all of them)
+        @return: A list containing the number of possible results for each range query, in the same order
+        """
+        counts = numpy.bincount(self.getMatches(rqs)[0], minlength=len(rqs))
+        if cap is not None:
+            counts = numpy.minimum(counts, cap + 1)
+        return counts.tolist()
+
+    def getMatches(self, rqs):
+        """Find the possible results of a batch of Range Queries
+
+        @param rqs: A list of Range Queries, as returned by generate.DRQ
+        @return: A tuple of two NumPy arrays: the index of the range query and the possible result (host ID) of every
+            match, ordered by range query and, within one range query, in the order of iteration over the range query
+        """
+        indptr, indices, length = MATRIX["indptr"], MATRIX["indices"], MATRIX["length"]
+        hosts = len(DB.NAMES)
+        sizes = numpy.array([len(rq) for rq in rqs], dtype=numpy.int_)
+        queries = numpy.fromiter((query for rq in rqs for query in rq), numpy.int_, sizes.sum())
+        rows = numpy.repeat(numpy.arange(len(rqs)), sizes)
+        keys = numpy.sort(rows * hosts + queries)
+        candidates = length[queries] > 0    # Queries that are valid targets
+        rows, queries = rows[candidates], queries[candidates]
+        if len(queries) == 0:
+            return rows, queries
+        lengths = length[queries]
+        ends = numpy.cumsum(lengths)
+        starts = ends - lengths
+        # Positions of the columns of all candidate rows in indices, concatenated
+        columns = indices[numpy.repeat(indptr[queries] - starts, lengths) + numpy.arange(ends[-1])]
+        wanted = numpy.repeat(rows, lengths) * hosts + columns
+        found = numpy.searchsorted(keys, wanted)
+        found[found == len(keys)] = 0
+        hits = numpy.add.reduceat(keys[found] == wanted, starts, dtype=numpy.int_)
+        matches = hits == lengths
+        return rows[matches], queries[matches]
+
 
 class DFBPatternBRQ():
     """Distinguishable First Block Pattern Attack for the basic (random) range query generation.
@@ -58,8 +185,42 @@ class DFBPatternBRQ():
         """
         fb, rq = block
         res = []
-        suspected_n = float(len(fb))
         rq.update(fb)
+        pattern_length_min, pattern_length_max = self.getPatternLengthRange(fb, rq)
+        for key in fb: # Iterate through all elements of the first block
+            if DB.isValidTarget(key) and (pattern_length_min <= DB.getPatternLengthUnchecked(key) <= pattern_length_max):
+                # if the current element is a beginning of a pattern with the correct length...
+                if rq.issuperset(DB.getPatternUnchecked(key)): # Check if the pattern is a subset of the remaining range query.
+                    res.append(key)
+        return res
+
+    def count(self, block, cap=None):
+        """Count the possible results of a given Range Query with a distinguishable first block
+
+        @param block: A tuple of the first block and the remaining range query, as taken by attack
+        @param cap: Stop counting once the number of possible results exceeds cap (None to count all of them)
+        @return: The number of possible results, or cap+1 if there are more than cap
+        """
+        fb, rq = block
+        number = 0
+        rq.update(fb)
+        pattern_length_min, pattern_length_max = self.getPatternLengthRange(fb, rq)
+        for key in fb: # The cheap check of the pattern length comes before the subset test
+            if DB.isValidTarget(key) and (pattern_length_min <= DB.getPatternLengthUnchecked(key) <= pattern_length_max):
+                if rq.issuperset(DB.getPatternUnchecked(key)):
+                    number += 1
+                    if cap is not None and number > cap:
+                        break
+        return number
+
+    def getPatternLengthRange(self, fb, rq):
+        """Estimate the range of pattern lengths the target can have
+
+        @param fb: The first block, as set
+        @param rq: The whole range query, including the first block, as set
+        @return: A tuple of the minimum and maximum pattern length
+        """
+        suspected_n = float(len(fb))
         rqlen = len(rq)
         pattern_length_max = math.ceil(rqlen / suspected_n)
         pattern_length_max += 2 * math.ceil(pattern_length_max / suspected_n)
@@ -68,12 +229,7 @@ class DFBPatternBRQ():
         # only leads to x-1. Those cases would be few and far between, considering the chances of actually getting so many duplicates,
         # but nevertheless, they should be dealt with.
         pattern_length_min = math.floor(rqlen / (suspected_n+1))
-        for key in fb: # Iterate through all elements of the first block
-            if DB.isValidTarget(key) and (pattern_length_min <= DB.getPatternLengthForHost(key) <= pattern_length_max):
-                # if the current element is a beginning of a pattern with the correct length...
-                if DB.getPatternForHost(key) <= rq: # Check if the pattern is a subset of the remaining range query.
-                    res.append(key)
-        return res
+        return pattern_length_min, pattern_length_max
 
 
 class DFBPatternPRQ():
@@ -96,10 +252,30 @@ class DFBPatternPRQ():
         rq.update(fb)
         for key in fb: # Iterate through all queries in the first block
             if DB.isValidTarget(key): # If the current query is a valid beginning of a pattern...
-                if DB.getPatternForHost(key) <= rq: # Check if the pattern is a subset of the second block.
+                if rq.issuperset(DB.getPatternUnchecked(key)): # Check if the pattern is a subset of the second block.
                     res.append(key)
         return res
 
+    def count(self, block, cap=None):
+        """Count the possible results of a given Range Query with a distinguishable first block
+
+        @param block: A tuple of the first block and the remaining range query, as taken by attack
+        @param cap: Stop counting once the number of possible results exceeds cap (None to count all of them)
+        @return: The number of possible results, or cap+1 if there are more than cap
+        """
+        fb, rq = block
+        number = 0
+        rq.update(fb)
+        isValidTarget = DB.isValidTarget
+        getPattern = DB.getPatternUnchecked
+        issuperset = rq.issuperset
+        for key in fb:
+            if isValidTarget(key) and issuperset(getPattern(key)):
+                number += 1
+                if cap is not None and number > cap:
+                    break
+        return number
+
 
 class FDBPattern():
     """Fully distinguishable Blocks pattern Attack
@@ -116,20 +292,113 @@ class FDBPattern():
         @param blocklist: A list of sets, each set representing a block, the main target in the first block.
         @return: List of possible results
         """
-        res = []
+        return list(self.iterResults(blocklist))
+
+    def count(self, blocklist, cap=None):
+        """Count the possible results of a given range query with fully distinguishable blocks
+
+        @param blocklist: A list of sets, each set representing a block, the main target in the first block.
+        @param cap: Stop counting once the number of possible results exceeds cap (None to count all of them)
+        @return: The number of possible results, or cap+1 if there are more than cap
+        """
+        number = 0
+        for _ in self.iterResults(blocklist):
+            number += 1
+            if cap is not None and number > cap:
+                break
+        return number
+
+    def iterResults(self, blocklist):
+        """Find the possible results of a given range query with fully distinguishable blocks one by one
+
+        @param blocklist: A list of sets, each set representing a block, the main target in the first block.
+        @return: A generator yielding the possible results
+        """
         length = len(blocklist)
-        for key in blocklist[0]: # Iterate through all candidates for the main target (as it must be in the first block)
-            if DB.isValidTarget(key) and DB.getPatternLengthForHost(key) == length: # If it is the beginning of a pattern of the correct length...
-                # The following is a method of determining if every block contains exactly one element of the pattern of the current candidate.
-                tmp = blocklist[1:]
-                cnt = {}
-                for i in range(length-1):
-                    cnt[i] = 0
-                for query in DB.getPatternForHost(key):
-                    if query != key:
-                        for i in range(len(tmp)):
-                            if query in tmp[i]:
-                                cnt[i] += 1
-                if not 0 in cnt.values():
-                    res.append(key)
-        return res
+        candidates = [key for key in blocklist[0] if DB.isValidTarget(key) and DB.getPatternLengthUnchecked(key) == length]
+        # All candidates for the main target (as it must be in the first block) that are the beginning of a pattern of the correct length
+        if not candidates:
+            return
+        needed = set()
+        for key in candidates:
+            needed.update(DB.getPatternUnchecked(key))
+        blocks = {} # Maps each query of a candidate pattern to the indices of the blocks (apart from the first) that contain it
+        for i in range(1, length):
+            for query in blocklist[i] & needed:
+                try:
+                    blocks[query].append(i)
+                except KeyError:
+                    blocks[query] = [i]
+        spread = max([len(indices) for indices in blocks.itervalues()] or [0])
+        # The largest number of blocks a single query is part of, used to detect early that a block cannot be covered anymore
+        for key in candidates:
+            # The following is a method of determining if every block contains at least one element of the pattern of the current candidate.
+            covered = [False] * length
+            missing = length - 1    # Number of blocks that do not contain an element of the pattern yet
+            remaining = length - 1  # Number of elements of the pattern that have not been looked at yet
+            for query in DB.getPatternUnchecked(key):
+                if missing == 0 or missing > remaining * spread:
+                    break # All blocks are covered, or the remaining queries cannot cover all missing blocks anymore
+                if query != key:
+                    remaining -= 1
+                    for i in blocks.get(query, ()):
+                        if not covered[i]:
+                            covered[i] = True
+                            missing -= 1
+            if missing == 0:
+                yield key
+
+
+class Combined():
+    """Combination of the attacks on all three attack models
+
+    Attacks the views of a range query generated by a combined generator (generate.DRQ.BRQ.CRQ or PBRQ.CRQ), each with
+    the attacker for its attack model. This allows comparing the attack models on the same range queries, while
+    generating each range query only once.
+    """
+
+    def __init__(self, attackers):
+        """Initialize
+
+        @param attackers: List of the uninitialized attackers for the views, in the order of the views
+        """
+        self.attackers = [attacker() for attacker in attackers]
+
+    def attack(self, views):
+        """Attack all views of a range query
+
+        @param views: A tuple of range queries, one for each attacker
+        @return: A tuple containing the list of possible results of each attacker
+        """
+        return tuple(attacker.attack(view) for attacker, view in zip(self.attackers, views))
+
+    def count(self, views, cap=None):
+        """Count the possible results of all views of a range query
+
+        @param views: A tuple of range queries, one for each attacker
+        @param cap: Stop counting once the number of possible results exceeds cap (None to count all of them)
+        @return: A tuple containing the number of possible results of each attacker (at most cap+1)
+        """
+        return tuple(attacker.count(view, cap) for attacker, view in zip(self.attackers, views))
+
+
+def getCounter(attacker, cap=None):
+    """Get a variant of an attacker that only counts the possible results
+
+    The attack function of the variant returns the number of possible results (see the count functions of the
+    attackers) instead of the list of possible results.
+
+    @param attacker: An attacker class of this module
+    @param cap: Stop counting once the number of possible results exceeds cap (None to count all of them)
+    @return: A subclass of the attacker (that can be directly initialized, with the arguments of the attacker)
+    """
+    class Counter(attacker):
+        def attack(self, rq):
+            return attacker.count(self, rq, cap)
+
+        def attackBatch(self, rqs):
+            return attacker.countBatch(self, rqs, cap)
+
+    if not hasattr(attacker, "attackBatch"): # The counter must not pretend to support batches
+        del Counter.attackBatch
+    return Counter
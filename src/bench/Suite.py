@@ -0,0 +1,182 @@
+'''
+Micro-benchmark suite
+
+Times the stages of the simulator separately: parsing the pattern file, partitioning the database, every range query
+generator and every attacker. Each benchmark reports the number of operations, the wall-clock and CPU time, the
+resulting operations per second, the memory usage of the process afterwards and how much it changed during the
+benchmark (see util.Profile.getRSS).
+
+The generators and attackers are benchmarked on the same list of random targets. The range queries an attacker is
+benchmarked on are generated before its timer starts, so only the attack itself is measured.
+
+@author: Max Maass
+'''
+import os
+import time
+import random
+from data import DB
+from var import Config
+from var import Context
+from generate import DRQ
+from attacker import Pattern as Attacker
+import parse.Pattern
+import util.Profile
+
+# The generators, by the name used in the results
+GENERATORS = [("BRQ.NDBRQ", DRQ.BRQ.NDBRQ),
+              ("BRQ.DFBRQ", DRQ.BRQ.DFBRQ),
+              ("BRQ.FDBRQ", DRQ.BRQ.FDBRQ),
+              ("PBRQ.NDBRQ", DRQ.PBRQ.NDBRQ),
+              ("PBRQ.DFBRQ", DRQ.PBRQ.DFBRQ),
+              ("PBRQ.FDBRQ", DRQ.PBRQ.FDBRQ)]
+
+# The attackers, by the name used in the results, with the generator producing their input
+ATTACKERS = [("NDBPattern", Attacker.NDBPattern, DRQ.BRQ.NDBRQ),
+             ("DFBPatternBRQ", Attacker.DFBPatternBRQ, DRQ.BRQ.DFBRQ),
+             ("DFBPatternPRQ", Attacker.DFBPatternPRQ, DRQ.PBRQ.DFBRQ),
+             ("FDBPattern", Attacker.FDBPattern, DRQ.BRQ.FDBRQ)]
+if Attacker.NUMPY:
+    ATTACKERS.insert(1, ("NDBPatternMatrix", Attacker.NDBPatternMatrix, DRQ.BRQ.NDBRQ))
+
+
+def measure(name, function, ops):
+    """Run and time a benchmark
+
+    @param name: The name of the benchmark
+    @param function: The function running the benchmark, called without arguments
+    @param ops: The number of operations the function performs
+    @return: A dictionary with the results
+    """
+    rss = util.Profile.getRSS()
+    wall = time.time()
+    cpu = time.clock()
+    function()
+    cpu = time.clock() - cpu
+    wall = time.time() - wall
+    after = util.Profile.getRSS()
+    return {"name": name,
+            "ops": ops,
+            "seconds": round(wall, 6),
+            "cpu_seconds": round(cpu, 6),
+            "ops_per_sec": round(ops / wall, 3) if wall > 0 else None,
+            "rss_kb": after,
+            "rss_delta_kb": after - rss}
+
+
+def benchParse():
+    """Benchmark parsing the pattern file in Config.INFILE
+
+    The compiled cache is neither loaded nor written. Can only be run once, as the database can not be emptied.
+
+    @return: A result dictionary, counting one operation per target
+    """
+    cache = Config.CACHE
+    Config.CACHE = False
+    try:
+        result = measure("parse", parse.Pattern.parse, 0)
+    finally:
+        Config.CACHE = cache
+    result["ops"] = len(DB.PATTERNS)
+    result["ops_per_sec"] = round(len(DB.PATTERNS) / result["seconds"], 3) if result["seconds"] > 0 else None
+    return result
+
+
+def benchPartition(size, repeat):
+    """Benchmark partitioning the database
+
+    The full database (size -1) is not benchmarked, as it is only copied instead of partitioned.
+
+    @param size: The size of the partition
+    @param repeat: The number of partitions to create
+    @return: A result dictionary, with the size of the partition
+    """
+    def run():
+        for _ in range(repeat):
+            DB.createDatabasePartition(size)
+    result = measure("createDatabasePartition", run, repeat)
+    result["size"] = size
+    return result
+
+
+def benchGenerator(name, generator, context, targets):
+    """Benchmark a range query generator
+
+    @param name: The name of the benchmark
+    @param generator: The generator class
+    @param context: The var.Context.RunContext to use
+    @param targets: The list of targets to generate range queries for
+    @return: A result dictionary
+    """
+    instance = generator(context)
+
+    def run():
+        for target in targets:
+            instance.generateDRQFor(target)
+    return measure(name, run, len(targets))
+
+
+def benchAttacker(name, attacker, generator, context, targets):
+    """Benchmark an attacker
+
+    Attackers that support batches are run on batches of Config.BATCH range queries, like in the simulator.
+
+    @param name: The name of the benchmark
+    @param attacker: The attacker class
+    @param generator: The class of the generator producing the range queries for the attacker
+    @param context: The var.Context.RunContext to use
+    @param targets: The list of targets to attack
+    @return: A result dictionary
+    """
+    instance = generator(context)
+    rqs = [instance.generateDRQFor(target) for target in targets]
+    attackerInstance = attacker()
+
+    def run():
+        if hasattr(attackerInstance, "attackBatch"):
+            for i in range(0, len(rqs), Config.BATCH):
+                attackerInstance.attackBatch(rqs[i:i+Config.BATCH])
+        else:
+            for rq in rqs:
+                attackerInstance.attack(rq)
+    return measure(name, run, len(rqs))
+
+
+def run(rqsize, partition, count, repeat=3, seed=0):
+    """Run the complete suite on the pattern file in Config.INFILE
+
+    The random number generator is seeded with the same value before every benchmark, so the results of two runs on the
+    same file are comparable.
+
+    @param rqsize: The size of the range queries
+    @param partition: The size of the client database (-1 for the full database)
+    @param count: The number of targets the generators and attackers are run on
+    @param repeat: The number of partitions created by the partition benchmark. They have the size of the client
+        database, or half the number of queries if that is the full database.
+    @param seed: The seed of the random number generator
+    @return: The list of result dictionaries, in order of execution
+    """
+    results = [benchParse()]
+    results.append(benchPartition(partition if partition != -1 else len(DB.QUERIES) / 2, repeat))
+    DB.createDatabasePartition(partition)
+    random.seed(seed)
+    targets = [DB.getRandomTarget() for _ in range(count)]
+    for name, generator in GENERATORS:
+        random.seed(seed)
+        results.append(benchGenerator("generate." + name, generator, Context.RunContext(0, rqsize, partition), targets))
+    for name, attacker, generator in ATTACKERS:
+        random.seed(seed)
+        results.append(benchAttacker("attack." + name, attacker, generator, Context.RunContext(0, rqsize, partition), targets))
+    return results
+
+
+def getDatasetInfo(path):
+    """Describe the pattern file the database has been parsed from
+
+    @param path: The path of the pattern file
+    @return: A dictionary with the file name and size and the size of the database
+    """
+    return {"file": os.path.basename(path),
+            "bytes": os.path.getsize(path),
+            "targets": len(DB.PATTERNS),
+            "queries": len(DB.QUERIES),
+            "hosts": len(DB.NAMES)}
@@ -0,0 +1,68 @@
+'''
+Synthetic pattern files
+
+Generates pattern files in the format of DNSPatternFinder, so the simulator can be run and benchmarked without access to
+a real dataset. The lengths of the patterns follow a Zipf-like distribution (many short patterns, few long ones), the
+queries of a pattern are partly shared with other patterns and partly unique to it.
+
+@author: Max Maass
+'''
+import random
+from bisect import bisect
+
+
+def getLengthWeights(exponent, maxLength):
+    """Get the cumulative weights of the pattern lengths
+
+    A pattern of length L consists of the target and L-1 queries. The probability of the length L is proportional to
+    (L-1)^-exponent, for 2 <= L <= maxLength.
+
+    @param exponent: The exponent of the distribution (larger values produce more short patterns)
+    @param maxLength: The maximum pattern length
+    @return: List of cumulative weights, the i-th entry belonging to the length i+2
+    """
+    cumulative = []
+    total = 0.0
+    for queries in range(1, maxLength):
+        total += queries ** -exponent
+        cumulative.append(total)
+    return cumulative
+
+
+def generate(fobj, targets, exponent=1.5, maxLength=30, overlap=0.5, seed=None):
+    """Write a synthetic pattern file
+
+    Each query is, with probability overlap, chosen from the hosts shared by all patterns (the other targets and
+    targets/4 third-party hosts, like CDNs), otherwise it is a host that only occurs in this pattern. As a query may be
+    drawn twice, a pattern can be shorter than its drawn length.
+
+    @param fobj: The file object to write to
+    @param targets: The number of targets (lines)
+    @param exponent: The exponent of the Zipf-like pattern length distribution
+    @param maxLength: The maximum pattern length (at least 2)
+    @param overlap: The probability of a query being shared with other patterns (0 to 1)
+    @param seed: The seed of the random number generator (None for a random seed)
+    """
+    rng = random.Random(seed)
+    cumulative = getLengthWeights(exponent, max(maxLength, 2))
+    shared = max(targets / 4, 1)        # Number of third-party hosts
+    unique = 0                          # Number of hosts generated so far that only occur in a single pattern
+    for target in xrange(targets):
+        length = bisect(cumulative, rng.random() * cumulative[-1]) + 2
+        queries = []
+        for _ in xrange(length - 1):
+            if rng.random() < overlap:
+                host = rng.randrange(targets + shared)
+                if host < targets:
+                    if host == target:
+                        continue
+                    queries.append("t%i.com" % host)
+                else:
+                    queries.append("s%i.net" % (host - targets))
+            else:
+                queries.append("u%i.org" % unique)
+                unique += 1
+        if not queries: # Every target needs at least one query
+            queries.append("u%i.org" % unique)
+            unique += 1
+        fobj.write("t%i.com:%s\n" % (target, ",".join(queries)))
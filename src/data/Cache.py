@@ -0,0 +1,104 @@
+'''
+Compiled pattern database cache
+
+Stores the parsed pattern database in a binary file, so later runs on the same pattern file do not have to parse it
+again. The file consists of a header, the string table of all hostnames (ordered by host ID and separated by newlines)
+and three arrays: the host IDs of all targets, and the patterns of those targets as offsets into an array of query IDs.
+The header contains the size and SHA-1 hash of the pattern file the cache was built from, a cache for another version
+of the file is ignored.
+
+@author: Max Maass
+'''
+import os
+import sys
+import mmap
+import struct
+import hashlib
+from array import array
+from data import DB
+
+MAGIC = "DRQDB001"
+HEADER = struct.Struct("<8sqq20sqqqq")
+# magic, item size of the arrays, size of the pattern file, hash of the pattern file, length of the string table,
+# number of targets, number of query IDs, endianness marker
+
+
+def getCachePath(path):
+    """Get the path of the cache file for a pattern file
+
+    @param path: Path of the pattern file
+    @return: Path of the cache file
+    """
+    return path + ".cache"
+
+
+def getFileDigest(path):
+    """Get the SHA-1 hash of a file
+
+    @param path: Path of the file
+    @return: The binary digest
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as fobj:
+        for block in iter(lambda: fobj.read(1 << 20), ""):
+            digest.update(block)
+    return digest.digest()
+
+
+def save(path):
+    """Write the contents of the pattern database to the cache file of a pattern file
+
+    @param path: Path of the pattern file the database has been parsed from
+    """
+    targets = array('l')
+    indptr = array('l', [0])
+    indices = array('l')
+    for target in DB.PATTERNS:
+        targets.append(target)
+        indices.extend(DB.PATTERNS[target])
+        indptr.append(len(indices))
+    names = "\n".join(DB.NAMES)
+    header = HEADER.pack(MAGIC, targets.itemsize, os.path.getsize(path), getFileDigest(path), len(names), len(targets),
+                         len(indices), sys.byteorder == "little")
+    tmp = getCachePath(path) + ".tmp"
+    with open(tmp, 'wb') as fobj:
+        fobj.write(header)
+        fobj.write(names)
+        targets.tofile(fobj)
+        indptr.tofile(fobj)
+        indices.tofile(fobj)
+    os.rename(tmp, getCachePath(path))
+
+
+def load(path):
+    """Load the pattern database from the cache file of a pattern file
+
+    The cache file is memory-mapped, the tables are read directly from the mapping.
+
+    @param path: Path of the pattern file
+    @return: True if the database has been loaded, False if no valid cache exists for the current version of the file
+    """
+    cache = getCachePath(path)
+    if not os.path.exists(cache) or os.path.getsize(cache) < HEADER.size:
+        return False
+    with open(cache, 'rb') as fobj:
+        mm = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, itemsize, size, digest, names_len, target_count, index_count, little = HEADER.unpack(mm[:HEADER.size])
+        if magic != MAGIC or itemsize != array('l').itemsize or little != (sys.byteorder == "little"):
+            return False # Incompatible format or written on an incompatible platform
+        if size != os.path.getsize(path) or digest != getFileDigest(path):
+            return False # The pattern file has changed
+        offset = HEADER.size
+        names = mm[offset:offset+names_len].split("\n") if names_len > 0 else []
+        offset += names_len
+        tables = []
+        for count in (target_count, target_count + 1, index_count):
+            table = array('l')
+            table.fromstring(mm[offset:offset+count*itemsize])
+            tables.append(table)
+            offset += count * itemsize
+    finally:
+        mm.close()
+    DB.loadCompiled(names, tables[0], tables[1], tables[2])
+    return True
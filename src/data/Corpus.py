@@ -0,0 +1,190 @@
+'''
+Range query corpus
+
+Stores generated range queries in a binary file, so they can be attacked again later (or on other machines) without
+generating them again. The file consists of a header and one record per range query. A record is a sequence of
+integers: the host ID of the target, the number of blocks, the size of each block and the host IDs of the queries of all
+blocks, block by block. The first block contains the target, like in the block lists of generate.DRQ.
+
+The host IDs are only valid for the pattern file the corpus has been recorded from, its SHA-1 hash is stored in the
+header and checked when the corpus is read.
+
+@author: Max Maass
+'''
+import os
+import sys
+import struct
+from array import array
+from data import Cache
+import util.Error
+
+MAGIC = "DRQRQ001"
+HEADER = struct.Struct("<8sq20sqqqqq")
+# magic, item size of the records, hash of the pattern file, mode, range query size, size of the client database, number
+# of records, endianness marker
+
+
+class Writer():
+    """Writes range queries to a corpus file
+
+    The records are written to a temporary file, which replaces the corpus file when the writer is closed.
+    """
+
+    def __init__(self, path, patternfile, mode, rqsize, dbsplit):
+        """Initialize
+
+        @param path: Path of the corpus file
+        @param patternfile: Path of the pattern file the database has been parsed from
+        @param mode: Number of the mode the range queries have been generated for
+        @param rqsize: Size of the range queries
+        @param dbsplit: Size of the client database the range queries have been generated with
+        """
+        self.path = path
+        self.header = [MAGIC, array('l').itemsize, Cache.getFileDigest(patternfile), mode, rqsize, dbsplit, 0,
+                       sys.byteorder == "little"]
+        self.fobj = open(path + ".tmp", "wb")
+        self.fobj.write(HEADER.pack(*self.header)) # Placeholder, the number of records is only known when closing
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(exc_type is None)
+
+    def write(self, target, blocks):
+        """Write a range query
+
+        @param target: The host ID of the target
+        @param blocks: The block list of the range query, first block first (the format of the FDB generators)
+        """
+        record = array('l', [target, len(blocks)])
+        record.extend(len(block) for block in blocks)
+        for block in blocks:
+            record.extend(block)
+        record.tofile(self.fobj)
+        self.header[6] += 1
+
+    def close(self, commit=True):
+        """Finish the corpus file
+
+        @param commit: Replace the corpus file with the records written (otherwise, they are discarded)
+        """
+        if self.fobj is None:
+            return
+        if commit:
+            self.fobj.seek(0)
+            self.fobj.write(HEADER.pack(*self.header))
+            self.fobj.close()
+            os.rename(self.path + ".tmp", self.path)
+        else:
+            self.fobj.close()
+            os.remove(self.path + ".tmp")
+        self.fobj = None
+
+
+class Reader():
+    """Reads the range queries of a corpus file
+
+    All records are kept in a single array, which is inherited by forked worker processes. Range queries are only
+    decoded when they are requested.
+    """
+
+    def __init__(self, path, patternfile, part=0, parts=1):
+        """Initialize
+
+        Reads the corpus file, terminating the program if it is invalid or has been recorded from another pattern file.
+        The records can be split into parts, for example to attack them on multiple machines.
+
+        @param path: Path of the corpus file
+        @param patternfile: Path of the pattern file the database has been parsed from
+        @param part: Index of the part of the records to read (0 to parts-1)
+        @param parts: Number of equally large parts the records are split into
+        """
+        with open(path, "rb") as fobj:
+            header = fobj.read(HEADER.size)
+            if len(header) < HEADER.size:
+                util.Error.printErrorAndExit("Corpus: " + path + " is not a range query corpus")
+            magic, itemsize, digest, self.mode, self.rqsize, self.dbsplit, count, little = HEADER.unpack(header)
+            if magic != MAGIC or itemsize != array('l').itemsize or little != (sys.byteorder == "little"):
+                util.Error.printErrorAndExit("Corpus: " + path + " is not a range query corpus, or has been written on an incompatible platform")
+            if digest != Cache.getFileDigest(patternfile):
+                util.Error.printErrorAndExit("Corpus: " + path + " has not been recorded from " + patternfile)
+            self.data = array('l')
+            self.data.fromstring(fobj.read())
+        self.offsets = array('l') # Position of each record in self.data
+        position = 0
+        for _ in xrange(count):
+            self.offsets.append(position)
+            blocks = self.data[position+1]
+            position += 2 + blocks + sum(self.data[position+2:position+2+blocks])
+        if position != len(self.data):
+            util.Error.printErrorAndExit("Corpus: " + path + " is truncated or corrupt")
+        self.offsets = self.offsets[count * part / parts:count * (part + 1) / parts]
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def getTarget(self, index):
+        """Get the target of a range query
+
+        @param index: The index of the range query
+        @return: The host ID of the target
+        """
+        return self.data[self.offsets[index]]
+
+    def getBlocks(self, index):
+        """Get the block list of a range query
+
+        @param index: The index of the range query
+        @return: A new list of sets of host IDs, the first block first
+        """
+        position = self.offsets[index] + 1
+        count = self.data[position]
+        lengths = self.data[position+1:position+1+count]
+        position += 1 + count
+        blocks = []
+        for length in lengths:
+            blocks.append(set(self.data[position:position+length]))
+            position += length
+        return blocks
+
+
+class Replay():
+    """Generator stand-in returning the range queries of a corpus
+
+    Used in place of a generator from generate.DRQ, but is asked for the range queries by their index in the corpus
+    instead of by target.
+    """
+
+    def __init__(self, reader, shape):
+        """Initialize
+
+        @param reader: The Reader of the corpus
+        @param shape: Function reshaping a block list into the format the attacker expects (see generate.DRQ.toNDB etc.)
+        """
+        self.reader = reader
+        self.shape = shape
+
+    def generateDRQFor(self, index, rep=0):
+        """Get a range query from the corpus
+
+        @param index: The index of the range query
+        @param rep: Ignored, every index has exactly one range query
+        @return: The range query, reshaped
+        """
+        return self.shape(self.reader.getBlocks(index))
+
+
+class Passthrough():
+    """Attacker stand-in returning the range query it is given
+
+    Used to collect the generated range queries while recording a corpus.
+    """
+
+    def attack(self, rq):
+        """Return the range query unchanged
+
+        @param rq: A range query
+        @return: The range query
+        """
+        return rq
@@ -5,16 +5,34 @@ Holds the Data parsed from the pattern file for use in other modules
 '''
 import random
 import util.Error
+from array import array
+from data.Sampler import Sampler
 
+NAMES = []          # Table mapping host IDs to hostnames
+IDS = {}            # Table mapping hostnames to host IDs
 PATTERNS = {}       # Database of all patterns
 QUERIES = set()     # Database of all Queries
+CANONICAL = {}      # Maps each distinct pattern to the frozenset all targets with it share, while the database is filled
 SIZES = {}          # Database mapping lengths to a list of domain patterns with that length
 LENGTH = {}         # Database mapping domains to the lengths of their patterns
 PATTERNS_C = {}     # Database of all patterns the client may use
 QUERIES_C = set()   # Database of all queries the client may use
 SIZES_C = {}        # Database mapping lengths to a list of domain patterns with that length that are allowed for the client
+TARGETS_S = Sampler()   # Sampling index over the keys of PATTERNS_C
+QUERIES_S = Sampler()   # Sampling index over QUERIES_C
+SIZES_S = {}            # Sampling indexes over the sets in SIZES_C
+PADDING_C = {}          # Maps pattern lengths to the pairs of pattern lengths in SIZES_C that sum up to them
+INDPTR = array('l')     # Incidence matrix of PATTERNS in CSR format: row pointers, one row per host ID
+INDICES = array('l')    # Incidence matrix of PATTERNS in CSR format: column indices (host IDs of the queries)
+FLAT = False            # Are the accessors using the flat tables (see flatten)?
+FLAT_LENGTH = array('l')    # Flat copy of LENGTH, indexed by host ID (0 for hosts that are no valid target)
+FLAT_LENGTH_C = array('l')  # Pattern lengths of the targets in PATTERNS_C, indexed by host ID (0 for all other hosts)
+NESTED = array('l')     # Targets of the nested partitions, in the order they have been added (see buildNestedPartitions)
+NESTED_C = {}           # Maps the sizes of the nested partitions to the number of targets in NESTED they consist of
 # Formats of the dictionaries:
-# PATTERNS[domain] = Pattern_as_list
+# NAMES[host_id] = hostname
+# IDS[hostname] = host_id
+# PATTERNS[domain] = Pattern_as_frozenset (the same object for all domains with identical patterns)
 # QUERIES = set(all_known_queries)
 # SIZES[length] = list_of_domains_with_pattern_length
 # LENGTH[domain] = length_of_domain_pattern
@@ -26,6 +44,20 @@ SIZES_C = {}        # Database mapping lengths to a list of domain patterns with
 # by the client. Some of the other functions are also used by the client, but in their case, it makes no difference that the
 # attacker database was used.
 # The attacker does not know the contents of the *_C-databases.
+# The *_S-indexes hold the same host IDs as their *_C counterparts, but allow drawing random elements in constant time. They
+# are built once by createDatabasePartition and used by the getRandom*-functions.
+# INDPTR and INDICES encode PATTERNS as a sparse incidence matrix, see buildIncidenceMatrix. They are only built on request.
+# The FLAT_*-tables, together with INDPTR and INDICES, hold everything the generators and attackers need in arrays. After
+# flatten has been called, the accessors use them instead of the dictionaries and sets (see flatten for the reason).
+# NESTED and NESTED_C describe a family of nested client databases: the partition of size s consists of the first
+# NESTED_C[s] targets in NESTED. They are built by buildNestedPartitions and selected by selectNestedPartition.
+
+# Every hostname is interned into a dense integer ID (see internHostname) while the pattern file is parsed. All databases
+# store these IDs instead of the hostnames, which saves memory and makes the hashing in the set operations of the attackers
+# cheaper. Hostnames are only needed again when results are reported, use getHostname to translate an ID back.
+# Patterns are hash-consed the same way: targets with identical patterns (e.g. sites that only reference each other, or
+# multiple hostnames of the same site) share one frozenset, the duplicates are freed right after they have been parsed.
+# The table of canonical patterns is only needed while targets are added, see releaseCanonicalPatterns.
 
 
 def createDatabasePartition(size):
@@ -36,7 +68,8 @@ def createDatabasePartition(size):
     The goal is to choose a number of patterns whose lengths add up to the size given as a parameter. If the parameter is set to
     -1, the whole dataset is used (PATTERNS_C == PATTERNS and so on).
     The result of this function is deterministically determined, using the target size as the random number generator seed.
-    The RNG will be reset to a new, pseudorandom seed before this function terminates.
+    A separate random number generator is used, the state of the random module is not changed.
+    A previous partition is discarded, so the database can be partitioned again for another size.
 
     @param size: The number of Queries the client database should contain (or -1, if the database should be the full set).
     @return: The number of queries QUERIES_C actually contains in the end.
@@ -45,19 +78,22 @@ def createDatabasePartition(size):
     if size > len(QUERIES):
         util.Error.printErrorAndExit("createDatabasePartition: size must be less than or equal to the number of unique queries (%i)" \
             % (len(QUERIES)))
+    PATTERNS_C.clear()
+    QUERIES_C.clear()
+    SIZES_C.clear()
     if size == -1 or size==len(QUERIES):
         PATTERNS_C.update(PATTERNS)
         QUERIES_C.update(QUERIES)
         SIZES_C.update(SIZES)
     else:
         # util.Error.printErrorAndExit("createDatabasePartition: Unimplemented for size=" + str(size))
-        random.seed(size)
+        rng = random.Random(size)
         # Deterministic RNG using the size as seed, so we get the same output every time for the same size.
         # This is desireable because we want the same database to be compared using different blocks sizes.
         # The output can only be properly compared if the data base is equal in all runs, hence we use a deterministic RNG here,
-        # it will be re-seeded afterwards to allow (pseudo-)randomness in the rest of the process.
-        domains = PATTERNS.keys()
-        random.shuffle(domains)     # Shuffle the list of domains (deterministically)
+        # separate from the one used in the rest of the process.
+        domains = sorted(PATTERNS)  # Sorted, so the result does not depend on the order of the dictionary
+        rng.shuffle(domains)        # Shuffle the list of domains (deterministically)
         csize = 0                   # Initialize the variable containing the current size of the database
         for domain in domains:
             if csize + LENGTH[domain] <= size:  # The pattern will fit into our requested number, add it to the clients database
@@ -70,35 +106,220 @@ def createDatabasePartition(size):
                 csize = len(QUERIES_C)
             else: # The pattern length of domain is larger than the number of missing patterns, skip this pattern.
                 continue
-        random.seed()
-        # Re-seed the RNG with the current system time or a better source, if one is available (determined by the python interpreter)
+    buildSamplingIndexes()
+    buildPaddingTable()
+    if FLAT:
+        flatten()
     return len(QUERIES_C)
 
 
-def getRandomTarget():
+def buildNestedPartitions(sizes):
+    """Prepare nested partitions of the database for multiple sizes
+
+    Works like createDatabasePartition, but for a list of sizes at once: The domains are shuffled only once (using the
+    largest size as seed) and the partitions are filled greedily in order of increasing size. Each partition contains the
+    ones of all smaller sizes, a domain that does not fit into a partition is kept in order for the larger ones. The
+    filling of a partition stops as soon as it has reached its size, so the domains are walked through only once, apart
+    from those that have been passed over for the smaller sizes.
+    The partitions are NOT the same as the ones createDatabasePartition creates for the same sizes, not even the largest
+    one: a domain added to a smaller partition may have been skipped by createDatabasePartition, and the other way round,
+    as both fill greedily but reach each domain with different queries already in the partition. Results of runs with
+    and without nested partitions can therefore not be compared directly.
+
+    Only the order in which the targets have been added and the number of targets per size are stored, use
+    selectNestedPartition to make one of the partitions the client database.
+
+    @param sizes: List of the number of Queries the client databases should contain (-1 for the full set)
+    """
+    full = len(QUERIES)
+    for size in sizes:
+        if size > full:
+            util.Error.printErrorAndExit("buildNestedPartitions: size must be less than or equal to the number of unique queries (%i)" \
+                % (full))
+    thresholds = sorted(set(full if size == -1 else size for size in sizes))
+    del NESTED[:]
+    NESTED_C.clear()
+    domains = sorted(PATTERNS)
+    random.Random(thresholds[-1]).shuffle(domains) # Deterministic, see createDatabasePartition
+    queries = set()             # The queries of the current partition
+    for size in thresholds:
+        if size == full:        # Like in createDatabasePartition, the full set contains all patterns
+            NESTED.extend(domains)
+            domains = []
+        else:
+            remaining = []      # The domains that have not been added yet, in order
+            for i, domain in enumerate(domains):
+                if len(queries) == size: # The partition is full, keep the rest for the larger ones
+                    remaining.extend(domains[i:])
+                    break
+                if len(queries) + LENGTH[domain] <= size:
+                    NESTED.append(domain)
+                    queries.update(PATTERNS[domain])
+                else:
+                    remaining.append(domain)
+            domains = remaining
+        NESTED_C[size] = len(NESTED)
+
+
+def selectNestedPartition(size):
+    """Use one of the nested partitions as client database
+
+    Fills the *_C-databases with the partition of the given size, which must have been prepared by buildNestedPartitions.
+
+    @param size: The number of Queries the client database should contain (or -1, if the database should be the full set).
+    @return: The number of queries QUERIES_C actually contains.
+    """
+    if size == -1:
+        size = len(QUERIES)
+    if size not in NESTED_C:
+        util.Error.printErrorAndExit("selectNestedPartition: no nested partition of size %i has been built" % (size))
+    PATTERNS_C.clear()
+    QUERIES_C.clear()
+    SIZES_C.clear()
+    for i in xrange(NESTED_C[size]):
+        domain = NESTED[i]
+        PATTERNS_C[domain] = PATTERNS[domain]
+        QUERIES_C.update(PATTERNS[domain])
+        try:
+            SIZES_C[LENGTH[domain]].add(domain)
+        except KeyError:
+            SIZES_C[LENGTH[domain]] = set([domain])
+    buildSamplingIndexes()
+    buildPaddingTable()
+    if FLAT:
+        flatten()
+    return len(QUERIES_C)
+
+
+def buildSamplingIndexes():
+    """Build the sampling indexes
+
+    Fills TARGETS_S, QUERIES_S and SIZES_S with the contents of PATTERNS_C, QUERIES_C and SIZES_C.
+    Called by createDatabasePartition, the client databases must not be changed afterwards.
+    The host IDs are added in sorted order. The order of the sets and dictionaries depends on the order their entries
+    have been inserted in, which differs between a parsed database and one loaded from the cache, and the random draws
+    pick hosts by their position in the indexes.
+    """
+    TARGETS_S.clear()
+    TARGETS_S.update(sorted(PATTERNS_C))
+    QUERIES_S.clear()
+    QUERIES_S.update(sorted(QUERIES_C))
+    SIZES_S.clear()
+    for length in SIZES_C:
+        SIZES_S[length] = Sampler(sorted(SIZES_C[length]))
+
+
+def buildPaddingTable():
+    """Build the table of padding splits
+
+    For every pattern length in SIZES_C, PADDING_C contains the list of pairs (pad1_len, pad2_len) with
+    pad1_len + pad2_len == length and pad1_len <= pad2_len, for which patterns of both lengths exist in the client database.
+    The pairs are ordered by increasing pad1_len. Called by createDatabasePartition.
+    """
+    PADDING_C.clear()
+    for length in SIZES_C:
+        PADDING_C[length] = [(pad1_len, length - pad1_len) for pad1_len in range(1, length/2+1)
+                             if pad1_len in SIZES_C and length - pad1_len in SIZES_C]
+
+
+def getPaddingSplits(length):
+    """Get the pairs of pattern lengths that can be used to pad a range query for a pattern of the provided length
+
+    @param length: Pattern length
+    @return: List of pairs (pad1_len, pad2_len), see buildPaddingTable
+    """
+    try:
+        return PADDING_C[length]
+    except KeyError:
+        return []
+
+
+def buildIncidenceMatrix():
+    """Build the incidence matrix of PATTERNS in CSR format
+
+    Row h of the matrix corresponds to the host ID h, the pattern of that host is stored as the column indices
+    INDICES[INDPTR[h]:INDPTR[h+1]], in sorted order. Rows of hosts that are not a valid target are empty.
+    Does nothing if the matrix has already been built.
+    """
+    if len(INDPTR) == len(NAMES) + 1:
+        return
+    del INDPTR[:]
+    del INDICES[:]
+    INDPTR.append(0)
+    for host in range(len(NAMES)):
+        if host in PATTERNS:
+            INDICES.extend(sorted(PATTERNS[host]))
+        INDPTR.append(len(INDICES))
+
+
+def flatten():
+    """Switch the accessors to flat tables
+
+    Worker processes forked by util.Parallel inherit the databases copy-on-write. But every access to a Python object
+    updates its reference count, so reading the dictionaries and sets of patterns in a worker slowly copies them into the
+    worker's memory, until each worker holds a copy of the whole database. This function copies all data the generators
+    and attackers need into flat arrays (FLAT_LENGTH, FLAT_LENGTH_C, the incidence matrix, and the arrays of the sampling
+    indexes) and makes the accessors use them. Reading an element of an array creates a new int object and leaves the
+    shared memory untouched.
+
+    The price is speed: getPatternUnchecked returns a new array instead of a reference to a frozenset afterwards, and
+    the set operations of the generators and attackers have to convert it first. So this is only worth it if the memory
+    of the workers is the limit (see the --flat option).
+    Must be called again after the client databases have changed, which createDatabasePartition and
+    selectNestedPartition do automatically.
+    """
+    global FLAT
+    buildIncidenceMatrix()
+    if len(FLAT_LENGTH) != len(NAMES):
+        FLAT_LENGTH[:] = array('l', [0]) * len(NAMES)
+        for host in LENGTH:
+            FLAT_LENGTH[host] = LENGTH[host]
+    FLAT_LENGTH_C[:] = array('l', [0]) * len(NAMES)
+    for length in SIZES_C:
+        for host in SIZES_C[length]:
+            FLAT_LENGTH_C[host] = length
+        SIZES_S[length].freeze(lambda host, length=length: 0 <= host < len(FLAT_LENGTH_C) and FLAT_LENGTH_C[host] == length)
+    FLAT = True
+
+
+def getRandomTarget(rng=random):
     """Choose random Host from the list of possible targets
 
     The List of possible targets is the set of keys of the PATTERNS Dictionary.
 
-    @return: A Hostname for which a pattern is known, as a string
+    @param rng: The random number generator to use (a random.Random instance or the random module)
+    @return: The ID of a Host for which a pattern is known
     """
-    return random.choice(PATTERNS_C.keys())
+    return TARGETS_S.choice(rng)
 
 
-def getRandomHosts(number):
+def getRandomTargets(number, rng=random):
+    """Choose distinct random Hosts from the list of possible targets
+
+    If not enough targets are available, all of them are returned (in random order).
+
+    @param number: Number of targets to return
+    @param rng: The random number generator to use (a random.Random instance or the random module)
+    @return: A list of unique host IDs for which a pattern is known
+    """
+    return TARGETS_S.sample(number, (), rng)
+
+
+def getRandomHosts(number, rng=random):
     """Choose random Hostnames from the set of all known hostnames
 
     If not enough queries are available, all available queries are returned.
 
     @param number: Number of Hostnames to return
-    @return: A list of unique hostnames (as strings)
+    @param rng: The random number generator to use (a random.Random instance or the random module)
+    @return: A list of unique host IDs
     """
     if not number > 0:
         util.Error.printErrorAndExit("getRandomHosts: number must be > 0, was " + str(number))
-    return random.sample(QUERIES_C, min(number, len(QUERIES_C)))
+    return QUERIES_S.sample(number, (), rng)
 
 
-def getRandomHostsByPatternLengthB(size, number, blacklist=set([])):
+def getRandomHostsByPatternLengthB(size, number, blacklist=set([]), rng=random):
     """Choose random Hostnames from the set of all Hostnames with a pattern with a specified length, excluding a Blacklist.
 
     If not enough hosts are available, the maximum possible number of hosts with the requested pattern
@@ -106,13 +327,14 @@ def getRandomHostsByPatternLengthB(size, number, blacklist=set([])):
 
     @param size: The size of the pattern each hostname should have
     @param number: The number of Hostnames that should be returned
-    @param blacklist: A set of Domain Names that should not be considered when drawing the random hosts
-    @return: A list of unique Hostnames (as strings)
+    @param blacklist: A set of host IDs that should not be considered when drawing the random hosts
+    @param rng: The random number generator to use (a random.Random instance or the random module)
+    @return: A list of unique host IDs
     """
-    return random.sample(SIZES_C[size] - blacklist, min(number, getNumberOfHostsWithPatternLengthB(size, blacklist)))
+    return SIZES_S[size].sample(number, blacklist, rng)
 
 
-def getRandomHostsByPatternLength(size, number):
+def getRandomHostsByPatternLength(size, number, rng=random):
     """Choose random Hostnames from the set of all Hostnames with a pattern with a specified length.
 
     If not enough hosts are available, the maximum possible number of hosts with the requested pattern
@@ -120,22 +342,23 @@ def getRandomHostsByPatternLength(size, number):
 
     @param size: The size of the pattern each hostname should have
     @param number: The number of Hostnames that should be returned
-    @return: A list of unique Hostnames (as strings)
+    @param rng: The random number generator to use (a random.Random instance or the random module)
+    @return: A list of unique host IDs
     """
-    return random.sample(SIZES_C[size], min(number, getNumberOfHostsWithPatternLength(size)))
+    return SIZES_S[size].sample(number, (), rng)
 
 
 def getNumberOfHostsWithPatternLengthB(length, blacklist=set([])):
     """Get the number of hosts with a particular pattern length, excluding a Blacklist
 
     @param length: Pattern length
-    @param blacklist: Set of Hostnames that should not be considered
+    @param blacklist: Set of host IDs that should not be considered
     @return: Number of hosts with that pattern length
     """
     if not length > 0:
         util.Error.printErrorAndExit("getNumberOfHostsWithPatternLengthB: length must be > 0, was " + str(length))
     try:
-        return len(SIZES_C[length] - blacklist)
+        return SIZES_S[length].countExcluding(blacklist)
     except KeyError:
         return 0
 
@@ -149,39 +372,55 @@ def getNumberOfHostsWithPatternLength(length):
     if not length > 0:
         util.Error.printErrorAndExit("getNumberOfHostsWithPatternLength: length must be > 0, was " + str(length))
     try:
-        return len(SIZES_C[length])
+        return len(SIZES_S[length])
     except KeyError:
         return 0
 
 
 def isValidTarget(host):
-    """Check if the provided hostname is a valid target (meaning a pattern exists for it).
+    """Check if the provided host is a valid target (meaning a pattern exists for it).
 
-    @param host: The hostname
+    @param host: The host ID
     @return: True (if the target is valid) or False (otherwise)
     """
-    try:
-        PATTERNS[host]
-        return True
-    except KeyError:
-        return False
+    if FLAT:
+        return 0 <= host < len(FLAT_LENGTH) and FLAT_LENGTH[host] > 0
+    return host in PATTERNS
 
 
 def getPatternForHost(host):
     """Get the Pattern for the provided hostname
 
-    @param host: Hostname
-    @return: A reference to the Pattern in the Pattern DB (a set)
+    Patterns are stored as frozensets, so the returned reference can be shared without copying it. Callers that need
+    to modify the pattern have to create their own copy.
+
+    @param host: Host ID
+    @return: A reference to the Pattern in the Pattern DB (a frozenset)
     """
     if not isValidTarget(host):
         util.Error.printErrorAndExit("getPatternForHost: Invalid host " + str(host))
-    return PATTERNS[host].copy()
+    return PATTERNS[host]
+
+
+def getPatternUnchecked(host):
+    """Get the Pattern for the provided host without checking if the host is a valid target
+
+    Fast accessor for the hot paths of the generators and attackers, which have already made sure that the host is a
+    valid target. Raises a KeyError otherwise, or returns an empty pattern after flatten has been called.
+
+    @param host: Host ID of a valid target
+    @return: A reference to the Pattern in the Pattern DB (a frozenset, must not be modified), or a copy of the pattern as
+        array after flatten has been called
+    """
+    if FLAT:
+        return INDICES[INDPTR[host]:INDPTR[host+1]]
+    return PATTERNS[host]
 
 
 def getPatternLengthForHost(host):
     """Get the length of the pattern for the provided hostname
 
-    @param host: Hostname
+    @param host: Host ID
     @return: Length of the Pattern
     """
     if not isValidTarget(host):
@@ -189,40 +428,120 @@ def getPatternLengthForHost(host):
     return LENGTH[host]
 
 
+def getPatternLengthUnchecked(host):
+    """Get the length of the pattern for the provided host without checking if the host is a valid target
+
+    @param host: Host ID of a valid target
+    @return: Length of the Pattern
+    """
+    if FLAT:
+        return FLAT_LENGTH[host]
+    return LENGTH[host]
+
+
 def getAllPossibleTargets():
     """Get a list of all targets that have a pattern associated with them
 
-    @return: List of targets
+    @return: List of targets (host IDs), sorted
     """
-    return PATTERNS_C.keys()
+    return sorted(PATTERNS_C)
 
 
 def getAllTargetsWithLength(length):
     """Get a list of all targets whose patterns have a specific length
 
     @param length: The length
-    @return: A list of possible Targets
+    @return: A sorted list of possible Targets (host IDs)
     """
     if not length > 0:
         util.Error.printErrorAndExit("getAllTargetsWithLength: length must be > 0, was " + str(length))
     try:
-        return list(SIZES_C[length])
+        return sorted(SIZES_C[length])
     except KeyError:
         return []
 
 
+def internHostname(hostname):
+    """Get the ID of a hostname, assigning it the next free ID if it has not been seen before.
+
+    IDs are dense, starting at 0 and increasing by one for every new hostname. The same int object is returned for
+    every call with the same hostname, so all sets referencing a host share it.
+
+    @param hostname: The hostname (String)
+    @return: The host ID
+    """
+    try:
+        return IDS[hostname]
+    except KeyError:
+        host = len(NAMES)
+        IDS[hostname] = host
+        NAMES.append(hostname)
+        return host
+
+
+def getHostID(hostname):
+    """Get the ID of a known hostname
+
+    @param hostname: The hostname (String)
+    @return: The host ID, or -1 if the hostname is unknown
+    """
+    try:
+        return IDS[hostname]
+    except KeyError:
+        return -1
+
+
+def getHostname(host):
+    """Translate a host ID back to its hostname
+
+    @param host: Host ID
+    @return: The hostname (String)
+    """
+    return NAMES[host]
+
+
+def loadCompiled(names, targets, indptr, indices):
+    """Fill the database from compiled tables, as written by data.Cache
+
+    Bypasses the checks of internHostname and addTarget, the tables must have been created from a valid database.
+
+    @param names: List of hostnames, ordered by host ID
+    @param targets: Sequence of the host IDs of all targets
+    @param indptr: Sequence of offsets, the pattern of targets[i] is indices[indptr[i]:indptr[i+1]]
+    @param indices: Sequence of the host IDs of all patterns
+    """
+    hosts = range(len(names)) # Use the same int object for every occurrence of a host ID
+    NAMES.extend(names)
+    IDS.update(zip(names, hosts))
+    for i in range(len(targets)):
+        target = hosts[targets[i]]
+        pattern = frozenset([hosts[host] for host in indices[indptr[i]:indptr[i+1]]])
+        pattern = CANONICAL.setdefault(pattern, pattern)
+        PATTERNS[target] = pattern
+        length = len(pattern)
+        try:
+            SIZES[length].add(target)
+        except KeyError:
+            SIZES[length] = set([target])
+        LENGTH[target] = length
+    QUERIES.update(hosts[host] for host in indices)
+
+
 def addTarget(target, pattern):
     """Add a new target to the dictionary of targets.
 
-    @param target: hostname of the target (String)
-    @param pattern: query pattern (set)
+    @param target: host ID of the target, as returned by internHostname
+    @param pattern: query pattern (set of host IDs), stored as a frozenset, or as the frozenset of an identical pattern
+        that has been added before
     """
-    if not target != "":        # Target not empty
+    if not 0 <= target < len(NAMES) or NAMES[target] == "":  # Target not empty
         util.Error.printErrorAndExit("addTarget: target must not be empty")
     if not pattern != set([]):  # Pattern not empty
         util.Error.printErrorAndExit("addTarget: Pattern must not be empty")
     if isValidTarget(target):   # Target does not exist yet
         util.Error.printErrorAndExit("addTarget: target must not exist yet")
+    pattern = frozenset(pattern)
+    pattern = CANONICAL.setdefault(pattern, pattern)
     PATTERNS[target] = pattern
     length = len(pattern)
     try:
@@ -231,4 +550,16 @@ def addTarget(target, pattern):
         SIZES[length] = set([target])
     LENGTH[target] = length
     QUERIES.update(pattern)
-    return
\ No newline at end of file
+    return
+
+
+def releaseCanonicalPatterns():
+    """Free the table of canonical patterns, after all targets have been added
+
+    Targets added afterwards do not share their patterns with the ones added before.
+
+    @return: The number of distinct patterns in the table
+    """
+    distinct = len(CANONICAL)
+    CANONICAL.clear()
+    return distinct
\ No newline at end of file
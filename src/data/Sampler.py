@@ -0,0 +1,141 @@
+'''
+Indexed sampling structure for the client databases
+
+Keeps a collection of host IDs in an array, paired with a map from each ID to its position in that array. Random
+elements can therefore be drawn by index in constant time, while random.choice and random.sample would first have to
+convert the whole collection into a sequence on every call.
+
+@author: Max Maass
+'''
+import random
+from array import array
+
+
+class Sampler():
+    """Array-backed set of host IDs supporting constant-time random draws
+
+    Membership tests, insertion and removal are O(1) using the position map. Drawing does not modify the sampler, so
+    one instance can be shared by all generators.
+    Once the sampler will not be modified anymore, the position map can be replaced by a membership test on flat data
+    (see freeze), so that forked processes can draw from it without touching shared Python objects.
+    """
+
+    def __init__(self, hosts=()):
+        """Initialize
+
+        @param hosts: Iterable of host IDs the sampler should initially contain
+        """
+        self.hosts = array('l')     # The host IDs, in arbitrary order
+        self.position = {}          # Maps each host ID to its index in self.hosts
+        self.contains = self.position.__contains__ # Membership test
+        self.update(hosts)
+
+    def __len__(self):
+        return len(self.hosts)
+
+    def __contains__(self, host):
+        return self.contains(host)
+
+    def __iter__(self):
+        return iter(self.hosts)
+
+    def add(self, host):
+        """Add a host ID, if it is not already contained
+
+        @param host: The host ID
+        """
+        if host not in self.position:
+            self.position[host] = len(self.hosts)
+            self.hosts.append(host)
+
+    def update(self, hosts):
+        """Add all host IDs of an iterable
+
+        @param hosts: Iterable of host IDs
+        """
+        for host in hosts:
+            self.add(host)
+
+    def clear(self):
+        """Remove all host IDs"""
+        self.hosts = array('l')
+        self.position = {}
+        self.contains = self.position.__contains__
+
+    def freeze(self, contains):
+        """Drop the position map
+
+        Afterwards the sampler can not be modified anymore, membership is tested using the provided function instead.
+
+        @param contains: A function returning True if a host ID is contained in the sampler, False otherwise
+        """
+        self.position = None
+        self.contains = contains
+
+    def discard(self, host):
+        """Remove a host ID, if it is contained
+
+        The last element of the array is moved into the freed position, so the array stays dense.
+
+        @param host: The host ID
+        """
+        index = self.position.pop(host, None)
+        if index is None:
+            return
+        last = self.hosts.pop()
+        if index < len(self.hosts):
+            self.hosts[index] = last
+            self.position[last] = index
+
+    def choice(self, rng=random):
+        """Draw a single host ID uniformly at random
+
+        @param rng: The random number generator to use (a random.Random instance or the random module)
+        @return: A host ID
+        """
+        return self.hosts[rng.randrange(len(self.hosts))]
+
+    def countExcluding(self, blacklist):
+        """Count the host IDs that are not part of a blacklist
+
+        Runs in O(len(blacklist)) instead of building the set difference.
+
+        @param blacklist: A set of host IDs that should not be counted
+        @return: The number of contained host IDs not in the blacklist
+        """
+        contains = self.contains
+        return len(self.hosts) - sum(1 for host in blacklist if contains(host))
+
+    def sample(self, number, blacklist=(), rng=random):
+        """Draw distinct host IDs uniformly at random, without replacement, excluding a blacklist
+
+        If less than number host IDs are available, all available host IDs are returned (in random order).
+        As long as at most half of the available host IDs are requested and the blacklist covers at most half of the
+        sampler, the draw is done by rejection sampling in expected O(number) time. Otherwise the available host IDs are
+        collected first, which is O(len(self)), but then the result has a comparable size anyway.
+
+        @param number: The number of host IDs to draw
+        @param blacklist: A set of host IDs that must not be drawn
+        @param rng: The random number generator to use (a random.Random instance or the random module)
+        @return: A list of unique host IDs
+        """
+        size = len(self.hosts)
+        available = self.countExcluding(blacklist) if blacklist else size
+        number = min(number, available)
+        if number <= 0:
+            return []
+        if 2 * number <= available and 2 * available >= size:
+            chosen = set()
+            result = []
+            while len(result) < number:
+                host = self.hosts[rng.randrange(size)]
+                if host in chosen or host in blacklist:
+                    continue
+                chosen.add(host)
+                result.append(host)
+            return result
+        if blacklist:
+            pool = [host for host in self.hosts if host not in blacklist]
+        else:
+            pool = self.hosts.tolist()
+        return rng.sample(pool, number)
@@ -0,0 +1,158 @@
+'''
+Stratified choice of targets
+
+Splits the targets of the client database into strata by the length of their patterns (the sets in DB.SIZES_C) and
+decides how many targets are drawn from each stratum:
+
+- proportional: proportional to the number of targets in the stratum, like uniform sampling, but without its
+  random fluctuations of the number of samples per stratum
+- equal: the same number for every stratum, so that rare pattern lengths get as many samples as common ones
+- neyman: proportional to the number of targets times the standard deviation of the number of results in the stratum,
+  which minimizes the variance of the overall mean for a given number of targets. The standard deviations are estimated
+  from a pilot sample with an equal allocation.
+
+Except for the proportional allocation, the strata are not represented according to their size, so the overall
+statistics have to be reweighted, using the weights written by writeWeights.
+
+@author: Max Maass
+'''
+import math
+import random
+from data import DB
+
+METHODS = ["proportional", "equal", "neyman"]
+
+
+def getStrata():
+    """Get the sizes of the strata
+
+    @return: Dictionary mapping pattern lengths to the number of targets with that pattern length in the client database
+    """
+    return dict((length, len(DB.SIZES_S[length])) for length in DB.SIZES_S if len(DB.SIZES_S[length]) > 0)
+
+
+def allocate(number, weights, caps=None):
+    """Split a number of samples between strata, proportional to their weights
+
+    Fractional parts are distributed by the largest remainder method, ties are broken by pattern length, so the
+    allocation is deterministic. If a stratum would get more samples than its cap, it gets exactly its cap and the rest
+    is split between the other strata.
+
+    @param number: The number of samples to split
+    @param weights: Dictionary mapping pattern lengths to non-negative weights
+    @param caps: Dictionary mapping pattern lengths to the maximum number of samples of the stratum, or None for no limit
+    @return: Dictionary mapping pattern lengths to the number of samples (may add up to less than number if all strata
+        have reached their cap or have a weight of 0)
+    """
+    allocation = dict((length, 0) for length in weights)
+    remaining = set(length for length in weights if weights[length] > 0 and (caps is None or caps[length] > 0))
+    while number > 0 and remaining:
+        total = float(sum(weights[length] for length in remaining))
+        shares = dict((length, number * weights[length] / total) for length in remaining)
+        capped = [length for length in remaining if caps is not None and shares[length] >= caps[length]]
+        if capped: # Fill these strata and split the rest again
+            for length in capped:
+                allocation[length] = caps[length]
+                number -= caps[length]
+                remaining.discard(length)
+            continue
+        for length in remaining:
+            allocation[length] = int(shares[length])
+        rest = number - sum(allocation[length] for length in remaining)
+        for length in sorted(remaining, key=lambda length: (int(shares[length]) - shares[length], length))[:rest]:
+            allocation[length] += 1
+        break
+    return allocation
+
+
+def getAllocation(method, number, strata, replace=True, deviations=None, taken=None):
+    """Get the number of targets to draw from each stratum
+
+    @param method: "proportional", "equal" or "neyman"
+    @param number: The total number of targets
+    @param strata: The sizes of the strata, as returned by getStrata
+    @param replace: False if targets are drawn without replacement, which limits each stratum to its size. Targets that
+        do not fit into the strata with a positive weight are then allocated proportionally to the others.
+    @param deviations: For "neyman", dictionary mapping pattern lengths to the standard deviations of the number of results
+        (see getDeviations). If all of them are 0, the proportional allocation is used.
+    @param taken: Dictionary mapping pattern lengths to the number of targets already drawn without replacement from the
+        stratum (e.g. by the pilot sample), or None
+    @return: Dictionary mapping pattern lengths to the number of targets
+    """
+    caps = None
+    if not replace:
+        caps = dict((length, strata[length] - (taken or {}).get(length, 0)) for length in strata)
+    if method == "equal":
+        weights = dict((length, 1) for length in strata)
+    elif method == "neyman" and deviations is not None and any(deviations.get(length, 0) > 0 for length in strata):
+        weights = dict((length, strata[length] * deviations.get(length, 0)) for length in strata)
+    else:
+        weights = strata
+    allocation = allocate(number, weights, caps)
+    leftover = number - sum(allocation.itervalues())
+    if leftover > 0 and caps is not None: # The targets the weighted strata have no room for go to the others
+        rest = allocate(leftover, strata, dict((length, caps[length] - allocation[length]) for length in strata))
+        for length in rest:
+            allocation[length] += rest[length]
+    return allocation
+
+
+def getDeviations(seperateSum):
+    """Estimate the standard deviation of the number of results in each stratum
+
+    @param seperateSum: A statistics dictionary, as returned by generateStats
+    @return: Dictionary mapping pattern lengths to the sample standard deviation of the number of results of the attacks
+        on targets of that length (0 for less than two attacks)
+    """
+    deviations = {}
+    for length, counts in seperateSum.iteritems():
+        samples = sum(counts.itervalues())
+        if samples < 2:
+            deviations[length] = 0.0
+            continue
+        mean = float(sum(k * number for k, number in counts.iteritems())) / samples
+        variance = sum(number * (k - mean) ** 2 for k, number in counts.iteritems()) / (samples - 1)
+        deviations[length] = math.sqrt(variance)
+    return deviations
+
+
+def chooseTargets(allocation, replace=True, exclude=None, rng=random):
+    """Draw the targets of each stratum
+
+    @param allocation: Dictionary mapping pattern lengths to the number of targets to draw, as returned by getAllocation
+    @param replace: True to draw with replacement, False to draw distinct targets
+    @param exclude: Set of targets that must not be drawn without replacement (e.g. those of the pilot sample), or None
+    @param rng: The random number generator to use (a random.Random instance or the random module)
+    @return: List of targets (host IDs), shuffled, so that the strata are spread over the list
+    """
+    targets = []
+    for length in sorted(allocation):
+        if allocation[length] <= 0:
+            continue
+        if replace:
+            targets.extend(DB.SIZES_S[length].choice(rng) for _ in xrange(allocation[length]))
+        else:
+            targets.extend(DB.SIZES_S[length].sample(allocation[length], exclude or (), rng))
+    rng.shuffle(targets)
+    return targets
+
+
+def writeWeights(fo, method, strata, seperateSum):
+    """Write the weights needed to reweight the statistics of a stratified run
+
+    An estimate of a proportion over all targets of the client database is the sum of the counts of each stratum,
+    multiplied by the weight of the stratum. The weight is the share of the stratum among all targets, divided by the
+    number of attacked targets of the stratum.
+
+    @param fo: The file object to write to
+    @param method: The allocation method
+    @param strata: The sizes of the strata, as returned by getStrata
+    @param seperateSum: A statistics dictionary, as returned by generateStats
+    """
+    total = float(sum(strata.itervalues()))
+    fo.write("# Stratum weights, %s allocation\n" % method)
+    fo.write("# M targets share samples weight\n")
+    for length in sorted(strata):
+        samples = sum(seperateSum.get(length, {}).itervalues())
+        share = strata[length] / total
+        fo.write("%i %i %.6f %i %.9g\n" % (length, strata[length], share, samples, share / samples if samples else 0.0))
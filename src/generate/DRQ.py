@@ -7,17 +7,72 @@ results in different formats.
 
 Technically, the BasicRangeQuery and PatternRangeQuery provide a generator that returns a generated Range Query
 in fully distinguishable blocks format. The generators that are called from the outside use those generators
-and only reformat the output to suit their modes.
+and only reformat the output to suit their modes, using toNDB, toDFB and toFDB. The combined generators (CRQ) return
+all three formats of a single range query at once.
+The generators take their settings (the size of the range queries) from the var.Context.RunContext they have been
+initialized with, or from var.Config if none is given. Every range query is generated using its own random number
+generator, provided by the context, so it does not depend on which process generates it or what was generated before.
+Patterns are walked through in sorted order, because the iteration order of a frozenset depends on how it has been
+built, which differs between a parsed pattern database and one loaded from the cache (see data.Cache).
 
 @author: Max Maass
 '''
-from random import shuffle
+import random
 from data import DB
-from var import Config
+from var import Context
 from util import Error
 from itertools import cycle
 
 
+def toNDB(block):
+    """Reshape a block list into a range query without distinguishable blocks
+
+    @param block: List of sets of host IDs, as returned by generateBaseDRQ
+    @return: A single set containing the queries of all blocks
+    """
+    query = set()
+    for set_of_queries in block: # Put all Queries from all Blocks into one big block
+        query.update(set_of_queries)
+    return query
+
+
+def toDFB(block):
+    """Reshape a block list into a range query with a distinguishable first block
+
+    @param block: List of sets of host IDs, as returned by generateBaseDRQ
+    @return: A tuple of two sets, the first block (the set from the block list) and a new set containing the queries of
+        all other blocks
+    """
+    head = block[0]    # First Set of Queries
+    tail = set()       # Remaining Queries
+    for set_of_queries in block[1:]:  # Add all elements from the tailing query blocks to big query block
+        tail.update(set_of_queries)
+    return (head, tail)
+
+
+def toFDB(block, rng=random):
+    """Reshape a block list into a range query with fully distinguishable blocks
+
+    @param block: List of sets of host IDs, as returned by generateBaseDRQ
+    @param rng: The random number generator to use (a random.Random instance or the random module)
+    @return: A new list of the same sets, the first block first, the other blocks in random order
+    """
+    head = [block[0]]
+    tail = block[1:]
+    rng.shuffle(tail) # Shuffle the list to remove information about the order of the queries
+    return head + tail
+
+
+def toAll(block, rng=random):
+    """Reshape a block list into the range queries of all three attack models
+
+    @param block: List of sets of host IDs, as returned by generateBaseDRQ
+    @param rng: The random number generator to use (a random.Random instance or the random module)
+    @return: A tuple of the results of toNDB, toDFB and toFDB
+    """
+    return (toNDB(block), toDFB(block), toFDB(block, rng))
+
+
 class BasicRangeQuery(object):
     """Basic Range Query generators
 
@@ -25,28 +80,33 @@ class BasicRangeQuery(object):
     They will then proceed to shape their return value according to the generating strategy
     """
 
-    def generateBaseDRQ(self, domain):
+    def __init__(self, context=None):
+        """Initialize
+
+        @param context: The var.Context.RunContext to take the settings from (None for var.Config)
+        """
+        self.context = context if context is not None else Context.fromConfig()
+
+    def generateBaseDRQ(self, domain, rng=random):
         """Generator for Basic DNS Range Queries (randomly generated query sets)
 
         Queries are unique inside their respective sets, but may appear more than once across different
         query blocks.
 
-        @param domain: Domain for which a DNS Range Query should be generated
-        @return: List of Sets, in order, each set representing a query block
+        @param domain: Domain (host ID) for which a DNS Range Query should be generated
+        @param rng: The random number generator to use (a random.Random instance or the random module)
+        @return: List of Sets of host IDs, in order, each set representing a query block
         """
         if not DB.isValidTarget(domain):
-            Error.printErrorAndExit(domain + " is not a valid target")
-        patlen = DB.getPatternLengthForHost(domain)
+            Error.printErrorAndExit(str(domain) + " is not a valid target")
+        patlen = DB.getPatternLengthUnchecked(domain)
         block = [set()]
-        pattern = DB.getPatternForHost(domain) # Get the actual pattern of the target
-        randoms = DB.getRandomHosts((Config.RQSIZE-1)*len(pattern)) # Get random hosts (dummies)
-        pattern.remove(domain)
+        pattern = sorted(DB.getPatternUnchecked(domain)) # Get the actual pattern of the target, in a fixed order
+        randoms = DB.getRandomHosts((self.context.rqsize-1)*patlen, rng) # Get random hosts (dummies)
         block[0].add(domain)
-        i = 1
         for subquery in pattern: # Create the blocks that will hold dummies and actual queries
-            block.append(set())
-            block[i].add(subquery) # Add the actual query to its respective block
-            i += 1
+            if subquery != domain:
+                block.append(set([subquery])) # Add the actual query to its respective block
         for query, index in zip(randoms, cycle(range(patlen))): 
             # distribute the randomly chosen dummy queries as evenly as possible across the blocks
             block[index].add(query)
@@ -60,77 +120,84 @@ class PatternRangeQuery(object):
     They will then proceed to shape their return value according to the generating strategy.
     """
 
-    def generateBaseDRQ(self, domain):
+    def __init__(self, context=None):
+        """Initialize
+
+        @param context: The var.Context.RunContext to take the settings from (None for var.Config)
+        """
+        self.context = context if context is not None else Context.fromConfig()
+
+    def generateBaseDRQ(self, domain, rng=random):
         """Generator for Pattern-Based DNS Range Queries (trying to fill the query blocks with patterns)
 
         Queries are unique inside their respective sets, but may appear more than once across different
         query blocks.
 
-        @param domain: Domain for which a DNS Range Query should be generated
-        @return: List of Sets, in order, each set representing a query block
+        @param domain: Domain (host ID) for which a DNS Range Query should be generated
+        @param rng: The random number generator to use (a random.Random instance or the random module)
+        @return: List of Sets of host IDs, in order, each set representing a query block
         """
         if not DB.isValidTarget(domain):
-            Error.printErrorAndExit(domain + " is not a valid target")
-        pattern_length = len(DB.PATTERNS[domain])
+            Error.printErrorAndExit(str(domain) + " is not a valid target")
+        pattern_length = DB.getPatternLengthUnchecked(domain)
         block = [set()]
         num_of_available_patterns = DB.getNumberOfHostsWithPatternLength(pattern_length) - 1
-        if num_of_available_patterns >= Config.RQSIZE:
+        if num_of_available_patterns >= self.context.rqsize:
             hosts = set([domain])
-            hosts.update(set(DB.getRandomHostsByPatternLengthB(pattern_length, Config.RQSIZE-1, hosts)))
+            hosts.update(set(DB.getRandomHostsByPatternLengthB(pattern_length, self.context.rqsize-1, hosts, rng)))
             pattern_copy = {}
             for host in hosts:
-                pattern_copy[host] = DB.getPatternForHost(host)
-                pattern_copy[host].remove(host) 
+                pattern_copy[host] = [query for query in sorted(DB.getPatternUnchecked(host)) if query != host]
                 block[0].add(host)
             for i in range(1, pattern_length, 1):
                 block.append(set())
-                for host in pattern_copy:
-                    block[i].add(pattern_copy[host].pop())
+                for queries in pattern_copy.itervalues(): # The order does not matter, the block is a set
+                    block[i].add(queries.pop())
         else: 
-            num_of_needed_patterns = Config.RQSIZE - (num_of_available_patterns+1)
+            num_of_needed_patterns = self.context.rqsize - (num_of_available_patterns+1)
             padding = []
+            splits = DB.getPaddingSplits(pattern_length)
+            # All (pad1_len, pad2_len) pairs that sum to pattern_length and for which patterns exist in the client database
+            available = {}  # Number of hosts per pad1_len that have not been used for padding yet
+            split = 0       # Index of the first split that may still be usable
             for i in range(num_of_needed_patterns):
                 # Find patterns whose lengths sum to pattern_length (if any exist that have not been chosen yet)
-                pad1_len = pad2_len = -1
-                for pad1_len, pad2_len in zip(range(1, pattern_length/2+1, 1), range(pattern_length-1, pattern_length/2-1, -1)):
-                    # This is a construct that generates numbers that sum to pattern_length. It is used instead of truly random
-                    # numbers because it will not get stuck when no more patterns are available.
-                    if ((DB.getNumberOfHostsWithPatternLengthB(pad1_len, block[0]) > 0) and \
-                        (DB.getNumberOfHostsWithPatternLength(pad2_len) > 0)):
+                while split < len(splits):
+                    # The splits are tried in a fixed order instead of truly random numbers, because that will not get stuck
+                    # when no more patterns are available. A split whose pad1_len has run out of hosts never becomes usable
+                    # again, so it is skipped for the remaining padding patterns as well.
+                    pad1_len = splits[split][0]
+                    if pad1_len not in available:
+                        # block[0] only contains padding hosts of length pad1_len at this point, which are counted below
+                        available[pad1_len] = DB.getNumberOfHostsWithPatternLength(pad1_len)
+                    if available[pad1_len] > 0:
                         break
-                    elif pad1_len == pattern_length/2: # No patterns of the correct length have been found, abort
-                        pad1_len = -1
-                if (pad1_len == -1): # Break out of loop as no further patterns can be found.
+                    split += 1
+                if split == len(splits): # Break out of loop as no further patterns can be found.
                     break
+                pad1_len, pad2_len = splits[split]
+                available[pad1_len] -= 1
                 # The following few lines get the dummy patterns from the database and saves them to the list of dummy-patterns
-                pad1_host = DB.getRandomHostsByPatternLengthB(pad1_len, 1, block[0])[0]
-                pad1_pattern = DB.getPatternForHost(pad1_host)
-                pad1_pattern.remove(pad1_host)
+                pad1_host = DB.getRandomHostsByPatternLengthB(pad1_len, 1, block[0], rng)[0]
                 block[0].add(pad1_host)
                 padding.append([pad1_host])
-                for host in pad1_pattern:
-                    padding[i].append(host)
-                pad2_host = DB.getRandomHostsByPatternLength(pad2_len, 1)[0]
-                pad2_pattern = DB.getPatternForHost(pad2_host)
-                pad2_pattern.remove(pad2_host)
+                padding[i].extend(host for host in sorted(DB.getPatternUnchecked(pad1_host)) if host != pad1_host)
+                pad2_host = DB.getRandomHostsByPatternLength(pad2_len, 1, rng)[0]
                 padding[i].append(pad2_host)
-                for host in pad2_pattern:
-                    padding[i].append(host)
+                padding[i].extend(host for host in sorted(DB.getPatternUnchecked(pad2_host)) if host != pad2_host)
             # We now have as many dummy patterns as we will get. Start distributing them.
             pattern_copy = {}
             block[0].add(domain)
-            pattern_copy[domain] = DB.getPatternForHost(domain)
-            pattern_copy[domain].remove(domain)
-            for element in DB.getRandomHostsByPatternLengthB(pattern_length, num_of_available_patterns, block[0]):
+            pattern_copy[domain] = [query for query in sorted(DB.getPatternUnchecked(domain)) if query != domain]
+            for element in DB.getRandomHostsByPatternLengthB(pattern_length, num_of_available_patterns, block[0], rng):
                 # Get all patterns with the correct length and add them to the range query
-                pattern_copy[element] = DB.getPatternForHost(element)
-                pattern_copy[element].remove(element)
+                pattern_copy[element] = [query for query in sorted(DB.getPatternUnchecked(element)) if query != element]
                 block[0].add(element)
             for i in range(1, pattern_length, 1):
                 # Distribute the remaining patterns (those whose lengths sum to the correct length)
                 block.append(set())
-                for host in pattern_copy:
-                    block[i].add(pattern_copy[host].pop())
+                for queries in pattern_copy.itervalues(): # The order does not matter, the block is a set
+                    block[i].add(queries.pop())
                 for pattern in padding:
                     block[i].add(pattern[i])
         return block
@@ -150,51 +217,46 @@ class BRQ(Category):
     class NDBRQ(BasicRangeQuery):
         """No distinguishable Blocks Range Query"""
 
-        def generateDRQFor(self, domain):
+        def generateDRQFor(self, domain, rep=0):
             """Generate a Range Query for a given domain name.
 
             Returns a single set of queries.
-            len(block) == (len(DB.PATTERNS[domain])-1) * Config.RQSIZE is NOT guaranteed (Meaning that the intersection
+            len(block) == (len(DB.PATTERNS[domain])-1) * self.context.rqsize is NOT guaranteed (Meaning that the intersection
             between selected random queries per hostname in the pattern is not always empty), so
-            len(return_value) modulo Config.RQSIZE does not have to be zero.
+            len(return_value) modulo self.context.rqsize does not have to be zero.
 
             @param domain: The domain name for which a range query should be constructed
+            @param rep: The number of range queries generated for this domain before in this run (see
+                var.Context.RunContext.getRandom)
             @return: A set of queries
             @note: Compatible with NDBPattern
             """
-            block = BasicRangeQuery.generateBaseDRQ(self, domain)
-            query = set()
-            for set_of_queries in block: # Put all Queries from all Blocks into one big block
-                query.update(set_of_queries)
-            return query
+            return toNDB(BasicRangeQuery.generateBaseDRQ(self, domain, self.context.getRandom(domain, rep)))
 
 
     class DFBRQ(BasicRangeQuery):
         """Distinguishable first Block Range Query"""
-        def generateDRQFor(self, domain):
+        def generateDRQFor(self, domain, rep=0):
             """Generate a Range Query with a distinguishable first query block.
 
             Returned hostnames are unique inside their respective sets, but len(head + block) = len(head) + len(block) is NOT
             guaranteed (meaning that a single hostname can be in both sets).
-            len(block) == (len(DB.PATTERNS[domain])-1) * Config.RQSIZE is also NOT guaranteed (Meaning that the intersection
+            len(block) == (len(DB.PATTERNS[domain])-1) * self.context.rqsize is also NOT guaranteed (Meaning that the intersection
             between selected random queries per hostname in the pattern is not always empty)
 
             @param domain: The domain name for which a range query should be constructed
+            @param rep: The number of range queries generated for this domain before in this run (see
+                var.Context.RunContext.getRandom)
             @return: A tuple of two sets, the first containing the first query block, the second containing the remaining
                 queries
             @note: Compatible with DFBPattern
             """
-            block = BasicRangeQuery.generateBaseDRQ(self, domain)
-            head = block[0]    # First Set of Queries
-            tail = set()       # Remaining Queries
-            for set_of_queries in block[1:]:  # Add all elements from the tailing query blocks to big query block
-                tail.update(set_of_queries)
-            return (head, tail)
+            return toDFB(BasicRangeQuery.generateBaseDRQ(self, domain, self.context.getRandom(domain, rep)))
 
 
     class FDBRQ(BasicRangeQuery):
         """Fully distinguishable blocks range query"""
-        def generateDRQFor(self, domain):
+        def generateDRQFor(self, domain, rep=0):
             """Generate a Range Query with fully distinguishable blocks, meaning that each block contains exactly one
             element of the pattern, and len(list_of_blocks) == len(pattern).
 
@@ -202,69 +264,80 @@ class BRQ(Category):
             blocks.
 
             @param domain: The domain name for which a range query should be constructed
+            @param rep: The number of range queries generated for this domain before in this run (see
+                var.Context.RunContext.getRandom)
             @return: A list of sets, each set representing a query block with one element from the pattern and at most
-                Config.RQSIZE-1 randomly chosen hosts (sometimes less due to the nature of the random choice function
+                self.context.rqsize-1 randomly chosen hosts (sometimes less due to the nature of the random choice function
                 and the set data type eleminating duplicates). The target is guaranteed to be contained in the first
                 block, the other blocks can be in any order.
             @note: Compatible with FDBPattern
             """
-            block = BasicRangeQuery.generateBaseDRQ(self, domain)
-            head = [block[0]]
-            tail = block[1:]
-            shuffle(tail) # Shuffle the list to remove information about the order of the queries
-            block = head + tail
-            return block
+            rng = self.context.getRandom(domain, rep)
+            return toFDB(BasicRangeQuery.generateBaseDRQ(self, domain, rng), rng)
+
+    class CRQ(BasicRangeQuery):
+        """Combined range query"""
+        def generateDRQFor(self, domain, rep=0):
+            """Generate a Range Query in the formats of all three attack models at once.
+
+            The range query is only generated once, so the attack models can be compared on the same range queries at
+            the cost of a single generation.
+
+            @param domain: The domain name for which a range query should be constructed
+            @param rep: The number of range queries generated for this domain before in this run (see
+                var.Context.RunContext.getRandom)
+            @return: A tuple of the range query in the formats of NDBRQ, DFBRQ and FDBRQ. The views share the sets of
+                the query blocks, so none of them may be modified by an attacker.
+            @note: Compatible with attacker.Pattern.Combined
+            """
+            rng = self.context.getRandom(domain, rep)
+            return toAll(BasicRangeQuery.generateBaseDRQ(self, domain, rng), rng)
 
 
 class PBRQ(Category):
     """Pattern-based range query"""
     class NDBRQ(PatternRangeQuery):
         """No distinguishable blocks range query"""
-        def generateDRQFor(self, domain):
+        def generateDRQFor(self, domain, rep=0):
             """Generate a Range Query for a given domain name.
 
             Returns a single set of queries.
-            len(block) == (len(DB.PATTERNS[domain])-1) * Config.RQSIZE is NOT guaranteed (Meaning that the intersection
+            len(block) == (len(DB.PATTERNS[domain])-1) * self.context.rqsize is NOT guaranteed (Meaning that the intersection
             between selected random queries per hostname in the pattern is not always empty), so
-            len(return_value) modulo Config.RQSIZE does not have to be zero.
+            len(return_value) modulo self.context.rqsize does not have to be zero.
 
             @param domain: The domain name for which a range query should be constructed
+            @param rep: The number of range queries generated for this domain before in this run (see
+                var.Context.RunContext.getRandom)
             @return: A set of queries
             @note: Compatible with NDBPattern
             """
-            block = PatternRangeQuery.generateBaseDRQ(self, domain)
-            query = set()
-            for set_of_queries in block: # Put the contents of all blocks into one big block
-                query.update(set_of_queries)
-            return query
+            return toNDB(PatternRangeQuery.generateBaseDRQ(self, domain, self.context.getRandom(domain, rep)))
 
 
     class DFBRQ(PatternRangeQuery):
         """Distinguishable first block range query"""
-        def generateDRQFor(self, domain):
+        def generateDRQFor(self, domain, rep=0):
             """Generate a Range Query with a distinguishable first query block.
 
             Returned hostnames are unique inside their respective sets, but len(head + block) = len(head) + len(block) is NOT
             guaranteed (meaning that a single hostname can be in both sets).
-            len(block) == (len(DB.PATTERNS[domain])-1) * Config.RQSIZE is also NOT guaranteed (Meaning that the intersection
+            len(block) == (len(DB.PATTERNS[domain])-1) * self.context.rqsize is also NOT guaranteed (Meaning that the intersection
             between selected random queries per hostname in the pattern is not always empty)
 
             @param domain: The domain name for which a range query should be constructed
+            @param rep: The number of range queries generated for this domain before in this run (see
+                var.Context.RunContext.getRandom)
             @return: A tuple of two sets, the first containing the first query block, the second containing the remaining
                 queries
             @note: Compatible with DFBPattern
             """
-            block = PatternRangeQuery.generateBaseDRQ(self, domain)
-            head = block[0]    # First Set of Queries
-            tail = set()       # Remaining Queries
-            for set_of_queries in block[1:]:  # Add all elements from the tailing query blocks to big query block
-                tail.update(set_of_queries)
-            return (head, tail)
+            return toDFB(PatternRangeQuery.generateBaseDRQ(self, domain, self.context.getRandom(domain, rep)))
 
 
     class FDBRQ(PatternRangeQuery):
         """Fully distinguishable blocks range query"""
-        def generateDRQFor(self, domain):
+        def generateDRQFor(self, domain, rep=0):
             """Generate a Range Query with fully distinguishable blocks, meaning that each block contains exactly one
             element of the pattern, and len(list_of_blocks) == len(pattern).
 
@@ -272,14 +345,30 @@ class PBRQ(Category):
             blocks.
 
             @param domain: The domain name for which a range query should be constructed
+            @param rep: The number of range queries generated for this domain before in this run (see
+                var.Context.RunContext.getRandom)
             @return: A list of sets, each set representing a query block with one element from the pattern and at most
-                Config.RQSIZE-1 semi-randomly chosen hosts (sometimes less due to the nature of the random choice function
+                self.context.rqsize-1 semi-randomly chosen hosts (sometimes less due to the nature of the random choice function
                 and the set data type eleminating duplicates).
             @note: Compatible with FDBPattern
             """
-            block = PatternRangeQuery.generateBaseDRQ(self, domain)
-            head = [block[0]]
-            tail = block[1:]
-            shuffle(tail) # Shuffle the list to remove information about the order of the queries.
-            block = head + tail
-            return block
\ No newline at end of file
+            rng = self.context.getRandom(domain, rep)
+            return toFDB(PatternRangeQuery.generateBaseDRQ(self, domain, rng), rng)
+
+    class CRQ(PatternRangeQuery):
+        """Combined range query"""
+        def generateDRQFor(self, domain, rep=0):
+            """Generate a Range Query in the formats of all three attack models at once.
+
+            The range query is only generated once, so the attack models can be compared on the same range queries at
+            the cost of a single generation.
+
+            @param domain: The domain name for which a range query should be constructed
+            @param rep: The number of range queries generated for this domain before in this run (see
+                var.Context.RunContext.getRandom)
+            @return: A tuple of the range query in the formats of NDBRQ, DFBRQ and FDBRQ. The views share the sets of
+                the query blocks, so none of them may be modified by an attacker.
+            @note: Compatible with attacker.Pattern.Combined
+            """
+            rng = self.context.getRandom(domain, rep)
+            return toAll(PatternRangeQuery.generateBaseDRQ(self, domain, rng), rng)
@@ -7,37 +7,86 @@ Parses a pattern file and saves the content in a data structure for later use by
 '''
 from var import Config  # Configuration Variables
 from data import DB     # Database to save the parsed Patterns
+from data import Cache  # Compiled pattern database cache
 from util import Progress
+from sys import stderr
+import os
 
 
 def parse():
+    """Loads the INFILE
+
+    If a compiled cache of the current version of INFILE exists, the database is loaded from it. Otherwise, the file is
+    parsed and the cache is written afterwards. The cache is not used if Config.CACHE is disabled.
+    Either way, targets with identical patterns share a single frozenset (see DB.CANONICAL), the table used to find
+    them is freed afterwards.
+
+    No parameters or return values, all info is read from the config and written to the database.
+    """
+    if Config.CACHE and Cache.load(Config.INFILE):
+        if not Config.QUIET:
+            print "Loaded pattern database from " + Cache.getCachePath(Config.INFILE)
+    else:
+        parseFile()
+        if Config.CACHE:
+            try:
+                Cache.save(Config.INFILE)
+            except (IOError, OSError) as e:
+                stderr.write("[WARN] Parser: Could not write " + Cache.getCachePath(Config.INFILE) + ": " + str(e) + "\n")
+    distinct = DB.releaseCanonicalPatterns()
+    if Config.VERBOSE:
+        print "%i targets, %i distinct patterns" % (len(DB.PATTERNS), distinct)
+
+
+def parseLine(line):
+    """Parses a single line of the INFILE
+
+    @param line: The line, in the format target.tld:query1.tld,query2.tld,query3.tld,...
+    @return: The target and the list of queries (hostnames, without leading www. and port information)
+    """
+    line = line.strip()                                 # Remove trailing newlines
+    target = line[:line.find(":")]                      # Find the target
+    if target.startswith("www."):                       # remove leading www. of target
+        target = target[4:]
+    queries = line[line.find(":")+1:].split(",")        # Find the queries
+    for i in range(len(queries)):
+        element = queries[i]
+        if (element.find(":") > 0):
+            element = element[:element.find(":")]       # Remove Port information, if any
+        if element.startswith("www."):
+            element = element[4:]                       # Remove leading www., if any
+        queries[i] = element
+    return target, queries
+
+
+def parseFile():
     """Parses the INFILE
     INFILE is expected to have a format of:
     target.tld:query1.tld,query2.tld,query3.tld,...
 
+    Every hostname is interned into a host ID (see DB.internHostname), the database only stores those IDs.
+    The file is read only once, the progress is measured in bytes.
+    The file is parsed by a single process. Parsing it in multiple processes is not supported: only the splitting of the
+    lines (parseLine, about a quarter of the time) could be moved to other processes, interning the hostnames and
+    building the patterns has to happen in this one.
+
     No parameters or return values, all info is read from the config and written to the database.
     @bug: Leading www. in domain name may cause issues if the www. is omitted in the pattern
     """
     if not Config.QUIET:
         print("Beginning parsing of pattern file...")
-    with open(Config.INFILE, 'r') as fobj:
-        LC = sum(1 for line in fobj)                    # get line count of file (for progress bar)
-    stat = Progress.Bar(LC, "=")                        # get progress bar instance
-    for line in open(Config.INFILE, 'r'):               # Open the file for reading
-        line = line.strip()                             # Remove trailing newlines
-        target = line[:line.find(":")]                  # Find the target
-        if target.startswith("www."):                   # remove leading www. of target
-            target = target[4:]
-        queries = line[line.find(":")+1:].split(",")    # Find the queries
-        pattern = set()                                 # Add target and queries...
-        pattern.add(target)
-        for element in queries:
-            if (element.find(":") > 0):
-                element = element[:element.find(":")]   # Remove Port information, if any
-            if element.startswith("www."):
-                element = element[4:]                   # Remove leading www., if any
-            pattern.add(element)                        # Add to current pattern
-        DB.addTarget(target, pattern)                   # Actually add the information to the DB
-        stat.tick()                                     # notify progress bar
+    size = os.path.getsize(Config.INFILE)
+    stat = Progress.Bar(size, "=")                      # get progress bar instance, measuring bytes
+    with open(Config.INFILE, 'r') as fobj:              # Open the file for reading
+        for line in fobj:
+            target, queries = parseLine(line)
+            target = DB.internHostname(target)          # Use the host ID instead of the hostname from here on
+            pattern = set()                             # Add target and queries...
+            pattern.add(target)
+            for element in queries:
+                pattern.add(DB.internHostname(element)) # Add to current pattern
+            DB.addTarget(target, pattern)               # Actually add the information to the DB
+            stat.tick(len(line))                        # notify progress bar
     if not Config.QUIET:
         print "Done"
+
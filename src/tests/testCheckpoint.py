@@ -0,0 +1,106 @@
+'''
+Checkpoints of interrupted runs
+
+Interrupts the collection of results at the points where a checkpoint could become inconsistent, and checks that the
+saved checkpoint counts exactly the results of its completed targets.
+
+Run from the src folder with: python2.7 -m unittest discover -s tests
+
+@author: Max Maass
+'''
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import bench.Synthetic
+import var.Config
+import data.DB
+import parse.Pattern
+import util.Stream
+import util.Checkpoint
+import DRQPatternAttack
+
+JSONLSink = util.Stream.JSONLSink   # The sink replaced by InterruptedSink during the tests
+
+
+class InterruptedSink(JSONLSink):
+    """Result sink raising a KeyboardInterrupt right after writing a given number of records"""
+
+    remaining = 0   # Number of records to write before the interruption
+
+    def write(self, target, pattern_length, result):
+        JSONLSink.write(self, target, pattern_length, result)
+        InterruptedSink.remaining -= 1
+        if InterruptedSink.remaining == 0:
+            raise KeyboardInterrupt()
+
+
+class CheckpointTest(unittest.TestCase):
+    """A checkpoint saved on an interruption matches its completed targets"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.mkdtemp()
+        var.Config.INFILE = os.path.join(cls.folder, "patterns.txt")
+        var.Config.QUIET = True
+        var.Config.CACHE = False
+        with open(var.Config.INFILE, "w") as fobj:
+            bench.Synthetic.generate(fobj, 100, seed=1)
+        parse.Pattern.parse()
+        data.DB.createDatabasePartition(-1)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.folder)
+
+    def setUp(self):
+        self.path = os.path.join(self.folder, "checkpoint.json")
+        var.Config.STREAM = os.path.join(self.folder, "results.jsonl")
+        util.Stream.JSONLSink = InterruptedSink
+
+    def tearDown(self):
+        util.Stream.JSONLSink = JSONLSink
+        var.Config.STREAM = ""
+        for path in (self.path, os.path.join(self.folder, "results.jsonl")):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def testInterruptedAfterRecord(self):
+        checkpoint = util.Checkpoint.Checkpoint(self.path, 3600)  # Only saved because of the interruption
+        results = [(target, 0, [target]) for target in data.DB.getAllPossibleTargets()[:10]]
+        InterruptedSink.remaining = 5
+        self.assertRaises(KeyboardInterrupt, DRQPatternAttack.collectResults, iter(results), checkpoint)
+        with open(self.path, "r") as fobj:
+            state = json.load(fobj)
+        with open(var.Config.STREAM, "r") as fobj:
+            records = fobj.readlines()
+        self.assertEqual(len(records), 5)
+        self.assertEqual(state["completed"], [[data.DB.getHostname(target), 0] for target, _, _ in results[:4]])
+        self.assertEqual(sum(sum(counts.values()) for counts in state["seperateSum"].values()), 4)
+        self.assertEqual(state["stream_offset"], len("".join(records[:4])))
+
+    def testLoad(self):
+        targets = data.DB.getAllPossibleTargets()[:2]
+        checkpoint = util.Checkpoint.Checkpoint(self.path, 3600)
+        for target, rep in [(targets[0], 1), (targets[1], 0), (targets[0], 0)]:
+            checkpoint.add(target, rep, data.DB.getPatternLengthForHost(target), 1)
+        checkpoint.save()
+        loaded = util.Checkpoint.Checkpoint(self.path, 3600)
+        self.assertTrue(loaded.load())
+        self.assertEqual(loaded.completed, checkpoint.completed)
+        self.assertEqual(loaded.histogram.seperateSum, checkpoint.histogram.seperateSum)
+
+        # Checkpoints of older versions only list the targets, their occurrences are numbered in order
+        with open(self.path, "r") as fobj:
+            state = json.load(fobj)
+        state["completed"] = [hostname for hostname, _ in state["completed"]]
+        with open(self.path, "w") as fobj:
+            json.dump(state, fobj)
+        loaded = util.Checkpoint.Checkpoint(self.path, 3600)
+        self.assertTrue(loaded.load())
+        self.assertEqual(loaded.completed, [(targets[0], 0), (targets[1], 0), (targets[0], 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+'''
+Reproducibility of seeded runs
+
+Runs DRQPatternAttack.py in separate processes on a synthetic pattern file and checks that runs with the same seed write
+the same statistics, no matter if the pattern database has been parsed or loaded from its compiled cache, if the results
+are kept, streamed or reduced by the threads, and which attack engine is used.
+
+Run from the src folder with: python2.7 -m unittest discover -s tests
+
+@author: Max Maass
+'''
+import os
+import sys
+import glob
+import time
+import shutil
+import signal
+import tempfile
+import unittest
+import subprocess
+import bench.Synthetic
+import attacker.Pattern
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "DRQPatternAttack.py")
+
+
+class DeterminismTest(unittest.TestCase):
+    """Runs with the same seed give the same statistics"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.infile = os.path.join(self.folder, "patterns.txt")
+        with open(self.infile, "w") as fobj:
+            bench.Synthetic.generate(fobj, 1000, seed=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def start(self, mode, *options):
+        """Start an attack in the temporary folder
+
+        @param mode: The mode of operation
+        @param options: Additional command line options
+        @return: The subprocess.Popen instance of the attack
+        """
+        with open(os.devnull, "w") as devnull:
+            return subprocess.Popen([sys.executable, SCRIPT, "-m", str(mode), "-s", "10", "-c", "300", "--seed", "5", "-q",
+                                     "--stat"] + list(options) + [self.infile], cwd=self.folder, stdout=devnull,
+                                    stderr=devnull)
+
+    def attack(self, mode, *options):
+        """Run an attack in the temporary folder and read its statistics
+
+        @param mode: The mode of operation
+        @param options: Additional command line options
+        @return: Dictionary mapping the names of the statistics files to their contents
+        """
+        shutil.rmtree(os.path.join(self.folder, "_output"), ignore_errors=True)
+        self.assertEqual(self.start(mode, *options).wait(), 0)
+        return self.read()
+
+    def read(self):
+        """Read the statistics of the last attack
+
+        @return: Dictionary mapping the names of the statistics files to their contents
+        """
+        stats = {}
+        for path in glob.glob(os.path.join(self.folder, "_output", "*", "*", "*", "M-*.txt")):
+            with open(path, "r") as fobj:
+                stats[os.path.basename(path)] = fobj.read()
+        return stats
+
+    def testParsedEqualsCached(self):
+        for mode in range(1, 7):
+            for partition in ("-1", "2000"):
+                parsed = self.attack(mode, "-p", partition, "--no-cache")
+                self.attack(mode, "-p", partition) # Writes the cache
+                self.assertTrue(os.path.exists(self.infile + ".cache"))
+                cached = self.attack(mode, "-p", partition)
+                self.assertTrue(parsed)
+                self.assertEqual(parsed, cached, "mode %i, partition %s" % (mode, partition))
+                os.remove(self.infile + ".cache")
+
+    def testCollectedEqualsStreamed(self):
+        # 300 targets out of 1000 are drawn with replacement, so some targets are attacked more than once
+        stream = os.path.join(self.folder, "results.jsonl")
+        for mode in (1, 4):
+            collected = self.attack(mode)
+            self.assertTrue(collected)
+            self.assertEqual(collected, self.attack(mode, "-t", "2"), "mode %i, -t 2" % mode)
+            self.assertEqual(collected, self.attack(mode, "--stream", stream), "mode %i, --stream" % mode)
+            self.assertEqual(collected, self.attack(mode, "-t", "2", "--reduce"), "mode %i, --reduce" % mode)
+            os.remove(stream)
+
+    def testResumedEqualsUninterrupted(self):
+        stream = os.path.join(self.folder, "results.jsonl")
+        checkpoint = os.path.join(self.folder, "_output", "m1", "N10", "S-1", "checkpoint.json")
+        # With more than one thread, the occurrences of a target are completed in any order
+        for options in (["--stream", stream], ["-t", "2", "--stream", stream], ["-t", "2", "--reduce"]):
+            options = ["-c", "40000", "--checkpoint", "1"] + options
+            expected = self.attack(1, *options)
+            shutil.rmtree(os.path.join(self.folder, "_output"))
+            process = self.start(1, *options)
+            while not os.path.exists(checkpoint) and process.poll() is None: # Interrupt after the first checkpoint
+                time.sleep(0.01)
+            process.send_signal(signal.SIGINT)
+            process.wait()
+            self.assertTrue(os.path.exists(checkpoint), "finished before it could be interrupted")
+            self.assertEqual(self.start(1, "--resume", *options).wait(), 0)
+            self.assertEqual(expected, self.read(), " ".join(options))
+            if "--stream" in options:
+                with open(stream, "r") as fobj:
+                    self.assertEqual(sum(1 for _ in fobj), 40000)
+                os.remove(stream)
+
+    @unittest.skipUnless(attacker.Pattern.NUMPY, "NumPy is not installed")
+    def testMatrixEqualsSet(self):
+        for mode in (1, 4):
+            for options in ([], ["-t", "2"], ["--count-only"], ["-p", "2000"]):
+                expected = self.attack(mode, *options)
+                self.assertTrue(expected)
+                self.assertEqual(expected, self.attack(mode, "-e", "matrix", "-b", "7", *options),
+                                 "mode %i, %s" % (mode, " ".join(options)))
+
+
+if __name__ == "__main__":
+    unittest.main()
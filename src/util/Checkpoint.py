@@ -0,0 +1,141 @@
+'''
+Checkpoints of long running attacks
+
+Periodically saves the targets that have been attacked and the statistics gathered so far, so an interrupted run can be
+resumed later on.
+
+@author: Max Maass
+'''
+import os
+import json
+import time
+import data.DB
+import var.Config
+import var.Context
+import util.Error
+import util.Statistics
+
+
+class Checkpoint():
+    """Checkpoint of a run
+
+    Holds the list of completed targets with their repetition numbers (see var.Context.getRepetitions), the histogram of
+    their results and the seed of the run. If the results are streamed (see util.Stream), the size of the result file is
+    saved as well, so the records written after the last completed target can be dropped when the run is resumed. The
+    checkpoint is written to disk at most every interval seconds while results are added, and whenever save() is called.
+    The file is written to a temporary file first and then renamed, so an interruption while saving never leaves a
+    broken checkpoint behind.
+    """
+
+    def __init__(self, path, interval, seed=None):
+        """Initialize an empty checkpoint
+
+        @param path: Path of the checkpoint file
+        @param interval: Minimum number of seconds between two automatic saves
+        @param seed: Seed of the run (see var.Context.RunContext)
+        """
+        self.path = path
+        self.interval = interval
+        self.seed = seed
+        self.completed = []     # Completed (target (host ID), repetition)-tuples, in order of completion
+        self.histogram = util.Statistics.Histogram()
+        self.stream = None      # The util.Stream.JSONLSink the results are written to (see setStream)
+        self.streamOffset = None # Size of the result file after the record of the last completed target, None if unknown
+        self.consistent = True  # False while add or addChunk is changing the state
+        self.lastSave = time.time()
+
+    def load(self):
+        """Load the checkpoint file, if it exists
+
+        Terminates the program if the checkpoint was made for a different pattern file.
+
+        @return: True if a checkpoint was loaded, False otherwise
+        """
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "r") as fo:
+            state = json.load(fo)
+        if state["file"] != os.path.basename(var.Config.INFILE):
+            util.Error.printErrorAndExit("Checkpoint: " + self.path + " belongs to the pattern file " + state["file"])
+        self.seed = state.get("seed") # Checkpoints of older versions have no seed
+        self.streamOffset = state.get("stream_offset")
+        if state["completed"] and not isinstance(state["completed"][0], list):
+            # Checkpoints of older versions only list the targets, whose earliest occurrences had been completed
+            targets = [data.DB.getHostID(hostname) for hostname in state["completed"]]
+            self.completed = zip(targets, var.Context.getRepetitions(targets))
+        else:
+            self.completed = [(data.DB.getHostID(hostname), rep) for hostname, rep in state["completed"]]
+        for pattern_length in state["seperateSum"]:
+            for ard_len, number in state["seperateSum"][pattern_length].iteritems():
+                self.histogram.add(int(pattern_length), int(ard_len), number)
+        return True
+
+    def setStream(self, stream):
+        """Save the size of a result file with the checkpoint
+
+        @param stream: The util.Stream.JSONLSink the results are written to. The record of a target has to be written
+            before the target is added.
+        """
+        self.stream = stream
+        self.streamOffset = stream.tell()
+
+    def add(self, target, rep, pattern_length, k):
+        """Mark a target as completed and add its result to the histogram
+
+        Both happen in one step, so a checkpoint never counts a result without its target or the other way round. Saves
+        the checkpoint if the last save is at least interval seconds ago.
+
+        @param target: The target (host ID)
+        @param rep: The repetition number of the range query for the target
+        @param pattern_length: The length of the pattern of the target
+        @param k: The number of possible results of the attack on the target
+        """
+        self.consistent = False
+        self.histogram.add(pattern_length, k)
+        self.completed.append((target, rep))
+        if self.stream is not None:
+            self.streamOffset = self.stream.tell()
+        self.consistent = True
+        if time.time() - self.lastSave >= self.interval:
+            self.save()
+
+    def addChunk(self, targets, histogram):
+        """Mark the targets of a chunk as completed and add the histogram of their results
+
+        Unlike adding the targets one by one, this can not save the checkpoint with the histogram of the whole chunk but
+        only some of its targets. Saves the checkpoint if the last save is at least interval seconds ago.
+
+        @param targets: The (target (host ID), repetition)-tuples of the chunk
+        @param histogram: The util.Statistics.Histogram of their results
+        """
+        self.consistent = False
+        self.histogram.merge(histogram)
+        self.completed.extend(targets)
+        self.consistent = True
+        if time.time() - self.lastSave >= self.interval:
+            self.save()
+
+    def save(self):
+        """Write the checkpoint to disk
+
+        Does nothing if add or addChunk has been interrupted (e.g. by Ctrl+C) while changing the state. The last
+        checkpoint on disk is consistent, so it is kept in that case.
+        """
+        if not self.consistent:
+            return
+        state = {"file": os.path.basename(var.Config.INFILE),
+                 "seed": self.seed,
+                 "completed": [[data.DB.getHostname(target), rep] for target, rep in self.completed],
+                 "seperateSum": self.histogram.seperateSum}
+        if self.stream is not None: # The records of all completed targets have to be on disk
+            self.stream.flush()
+            state["stream_offset"] = self.streamOffset
+        with open(self.path + ".tmp", "w") as fo:
+            json.dump(state, fo)
+        os.rename(self.path + ".tmp", self.path)
+        self.lastSave = time.time()
+
+    def remove(self):
+        """Remove the checkpoint file, after the run has been finished"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -4,24 +4,64 @@ Management of files and folders
 @author: Max Maass
 '''
 import os
-import var.Config
+import var.Context
 import util.Error
 
-def openStatFile(M):
-	"""openStatFile
 
-	Open a statistics file, creating it and the directory structure it resides in, if necessary, and adding the relevant header information
-	
-	@param M: The pattern length for which the stat file is meant, or 0 if it is for pattern-length agnostic statistics.
-	@return: A file handler
+def getOutputPath(context=None):
+	"""getOutputPath
+
+	Get the folder that holds the output of the current run, creating it and the directory structure it resides in, if necessary
+
+	@param context: The var.Context.RunContext of the run (None for the run described by var.Config)
+	@return: The path of the folder, including a trailing slash
 	"""
-	path = "_output/m" + str(var.Config.MODENUM) + "/N" + str(var.Config.RQSIZE) + "/S" + str(var.Config.DBSPLIT) + "/"
+	if context is None:
+		context = var.Context.fromConfig()
+	path = "_output/m" + str(context.mode) + "/N" + str(context.rqsize) + "/S" + str(context.dbsplit) + "/"
 	# Create string containing the path to the folder that will contain the file
 	if not os.path.exists(path): # If the folder does not exist, create it
 		try:
 			os.makedirs(path)
 		except:
-			util.Error.printErrorAndExit("FileManagement: openStatFile: Error while creating " + path + ". Exiting.")
+			util.Error.printErrorAndExit("FileManagement: getOutputPath: Error while creating " + path + ". Exiting.")
+	return path
+
+
+def getCheckpointPath(context=None):
+	"""getCheckpointPath
+
+	Get the path of the checkpoint file of the current run, which resides next to its statistics files
+
+	@param context: The var.Context.RunContext of the run (None for the run described by var.Config)
+	@return: The path of the file
+	"""
+	return getOutputPath(context) + "checkpoint.json"
+
+
+def getWeightsPath(context=None):
+	"""getWeightsPath
+
+	Get the path of the file holding the stratum weights of the current run (see data.Strata), which resides next to its statistics files
+
+	@param context: The var.Context.RunContext of the run (None for the run described by var.Config)
+	@return: The path of the file
+	"""
+	return getOutputPath(context) + "weights.txt"
+
+
+def openStatFile(M, context=None):
+	"""openStatFile
+
+	Open a statistics file, creating it and the directory structure it resides in, if necessary, and adding the relevant header information
+	
+	@param M: The pattern length for which the stat file is meant, or 0 if it is for pattern-length agnostic statistics.
+	@param context: The var.Context.RunContext of the run (None for the run described by var.Config)
+	@return: A file handler
+	"""
+	if context is None:
+		context = var.Context.fromConfig()
+	path = getOutputPath(context)
 	if M == 0: 
 		filename = "M-" + "ALL" + ".txt" # General statistics
 	else:
@@ -29,9 +69,11 @@ def openStatFile(M):
 	fo = open(path + filename, "w") # Open file for writing. Will overwrite existing files!
 	# Now we write some header information into the file to give it some context.
 	if M == 0:
-		fo.write("# Statistics for m=%i, N=%i, S=%i, all M\n" % (var.Config.MODENUM, var.Config.RQSIZE, var.Config.DBSPLIT))
+		fo.write("# Statistics for %r, all M\n" % context)
 	else:
-		fo.write("# Statistics for m=%i, N=%i, S=%i, M=%i\n" % (var.Config.MODENUM, var.Config.RQSIZE, var.Config.DBSPLIT, M))
+		fo.write("# Statistics for %r, M=%i\n" % (context, M))
+	if context.seed is not None:
+		fo.write("# Seed %i\n" % context.seed)
 	fo.write("# k-definiteness count\n")
 	# Return the opened file object
 	return fo
\ No newline at end of file
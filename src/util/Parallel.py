@@ -1,64 +1,167 @@
 '''
 Parallelize a task
 
+The targets are split into small chunks, which are handed out to a pool of worker processes one at a time. A worker
+that finishes its chunk gets the next one, so workers that drew many long patterns do not hold up the others.
+The repetition number of every target (see var.Context.getRepetitions) is determined before the list is split, so the
+range queries do not depend on the number of processes or the size of the chunks. It is returned with the result, so the
+results can be told apart although they arrive out of order.
+If the results are only needed for the statistics, the workers can reduce them to histograms (see reduceChunk), so
+the candidate lists never have to be sent to the parent process.
+
 @author: Max Maass
 '''
 import multiprocessing
+import signal
 import var.Config
+import var.Context
+import data.DB
+import util.Profile
+import util.Statistics
 
+attackerInstance = None     # The attacker instance of a worker process, set by initWorker
+generatorInstance = None    # The generator instance of a worker process, set by initWorker
+progressBar = None          # The progress bar of a worker process, set by initWorker
 
-def parallelize(attackerFunction, generatorFunction, args, ProgressBarInstance):
-    '''Parallelize the call of targetFunction into count subprocesses
 
-    @param targetFunction: The function to call
-    @param args: The argument to the function (only one argument supported)
-    @param count: The number of Subprocesses to be spawned
-    @return: The merged results of the function
+def getChunkSize(count):
+    '''Determine the number of targets per chunk
+
+    @param count: The total number of targets
+    @return: var.Config.CHUNKSIZE, or, if that is 0, a size that gives every process about eight chunks
     '''
-    res_queue = multiprocessing.Queue() # Create a threadsafe queue for the results
-    res_dict = {}   # Create a result dictionary
-    processes = []  # Prepare the process list
-    part = int(len(args)/var.Config.THREADS)
-    # Determine the split of the input values to distribute them across all processes
-    for i in range(var.Config.THREADS): # Now we will reate var.Config.THREADS processes
-        if i != var.Config.THREADS-1: # If this is not the last process to be created...
-            arg = args[i*part:(i+1)*part] # Start it with this part of the input data
-        else:
-            arg = args[i*part:] # Else give it the remaining input values to make sure none are left out
-        p = multiprocessing.Process(target=catchResult, args=(attackerFunction(), \
-            generatorFunction(), arg, res_queue, ProgressBarInstance))
-        # Prepare a process that will run the catchResult-function with the provided arguments.
-        processes.append(p) # Add it to the process list for later process management...
-        p.start() # ...and run it.
-    for i in processes:
-        res_dict.update(res_queue.get()) # Get all results from all processes and save them
-    for p in processes:
-        p.join() # Wait for all processes to exit
-    return res_dict # Return the result dictionary
-
-
-def catchResult(attackerInstance, generatorInstance, args, res_queue, ProgressBarInstance):
-    '''Catch the results the called function provides and add them to the result_queue
-
-    @param attackerInstance: a attacker instance
-    @param generatorInstance: a generator instance
-    @param args: The List of Arguments that should be interated through
-    @param res_queue: The queue in which to save the results (Results are saved as one dictionary and submitted in the end)
+    if var.Config.CHUNKSIZE > 0:
+        return var.Config.CHUNKSIZE
+    return max(1, count / (var.Config.THREADS * 8))
+
+
+def parallelize(attackerFunction, generatorFunction, args, ProgressBarInstance):
+    '''Parallelize the generation of range queries and the attacks on them into var.Config.THREADS subprocesses
+
+    @param attackerFunction: The uninitialized attacker
+    @param generatorFunction: The uninitialized generator
+    @param args: The list of targets
     @param ProgressBarInstance: The instance of the progress bar that should be updated
-    @return: A dictionary mapping attacker arguments to results
+    @return: The merged results (a list of (target, attack result)-tuples, one per element of args, in order of
+        completion)
+    '''
+    res_list = []   # Create a result list
+    for results in iterParallel(attackerFunction, generatorFunction, args, ProgressBarInstance):
+        # Save the results of every chunk as soon as it is finished
+        res_list.extend((arg, result) for arg, _, result in results)
+    return res_list # Return the result list
+
+
+def iterParallel(attackerFunction, generatorFunction, args, ProgressBarInstance=None, repetitions=None, reduce=False):
+    '''Generate range queries for and attack a list of targets in a pool of processes, yielding results as they arrive
+
+    Exceptions raised in a worker are raised again in the calling process. The pool is terminated when the iteration
+    ends, including when it is aborted.
+
+    @param attackerFunction: The uninitialized attacker
+    @param generatorFunction: The uninitialized generator
+    @param args: The list of targets
+    @param ProgressBarInstance: The instance of the progress bar that should be updated (ticked by the workers), or None
+    @param repetitions: The list of repetition numbers of the targets, or None to number their occurrences in args (see
+        var.Context.getRepetitions)
+    @param reduce: True to let the workers reduce the results of each chunk (see reduceChunk)
+    @return: A generator yielding, per finished chunk and in order of completion, a list of (target, repetition, attack
+        result)-tuples, or the return value of reduceChunk if reduce is True
+    '''
+    size = getChunkSize(len(args))
+    if repetitions is None:
+        repetitions = var.Context.getRepetitions(args)
+    jobs = zip(args, repetitions)
+    chunks = [jobs[i:i+size] for i in range(0, len(jobs), size)]
+    pool = multiprocessing.Pool(var.Config.THREADS, initWorker, (attackerFunction(), generatorFunction(), ProgressBarInstance))
+    try:
+        iterator = pool.imap_unordered(reduceChunk if reduce else runChunk, chunks)
+        for _ in chunks:
+            while True:
+                try:
+                    results = iterator.next(1)
+                    # Waiting with a timeout keeps the parent responsive to Ctrl+C (a plain next() can not be interrupted)
+                    break
+                except multiprocessing.TimeoutError:
+                    if ProgressBarInstance is not None:
+                        ProgressBarInstance.update()
+            if ProgressBarInstance is not None:
+                ProgressBarInstance.update()
+            yield results
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def initWorker(attacker, generator, bar):
+    '''Initialize a worker process of the pool
+
+    Ctrl+C is ignored by the workers, the parent process handles it and terminates the pool. If requested, the worker is
+    profiled with cProfile (see util.Profile).
+
+    @param attacker: An attacker instance
+    @param generator: A generator instance
+    @param bar: A progress bar instance, or None
+    '''
+    global attackerInstance, generatorInstance, progressBar
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    attackerInstance = attacker
+    generatorInstance = generator
+    progressBar = bar
+    util.Profile.startProfiler()
+
+
+def runChunk(args):
+    '''Generate range queries for and attack a chunk of targets in a worker process
+
+    If the attacker supports attacking batches of range queries, var.Config.BATCH range queries are attacked at once.
+
+    @param args: The List of (target, repetition)-tuples that should be iterated through
+    @return: A list of (target, repetition, attack result)-tuples
     '''
     try:
-        resdict = {}
-        for arg in args:
-            resdict[arg] = attackerInstance.attack(generatorInstance.generateDRQFor(arg))
-            # Run an attack on an input value
-            ProgressBarInstance.tick() # Update progress bar
-        res_queue.put(resdict) # return result dictionary
-        return 0
-    except KeyboardInterrupt: # Exit on Ctrl+C
-        return 1
-    except Exception as e: # Catch and log exceptions
-        print "Parallel: Catch Result: Uncaught Exception"
-        print "Details:", type(e)
-        print e
-        return 2
+        results = []
+        if hasattr(attackerInstance, "attackBatch"): # The attacker can process multiple range queries at once
+            for i in range(0, len(args), var.Config.BATCH):
+                batch = args[i:i+var.Config.BATCH]
+                rqs = util.Profile.measure("generate", lambda: [generatorInstance.generateDRQFor(arg, rep) for arg, rep in batch])
+                results.extend((arg, rep, result) for (arg, rep), result
+                               in zip(batch, util.Profile.measure("attack", attackerInstance.attackBatch, rqs)))
+                if progressBar is not None:
+                    progressBar.tick(len(batch)) # Update progress bar
+        else:
+            for arg, rep in args:
+                rq = util.Profile.measure("generate", generatorInstance.generateDRQFor, arg, rep)
+                results.append((arg, rep, util.Profile.measure("attack", attackerInstance.attack, rq)))
+                # Run an attack on an input value
+                if progressBar is not None:
+                    progressBar.tick() # Update progress bar
+        if progressBar is not None:
+            progressBar.flush()
+        util.Profile.flush(True)
+        util.Profile.dumpProfiler("worker")
+        return results
+    except SystemExit as e:
+        # util.Error.printErrorAndExit has already reported the problem. Exiting would only kill this worker and leave the
+        # parent waiting for the chunk, so the exit is turned into an exception that is raised again in the parent.
+        raise RuntimeError("Parallel: worker exited with status %s" % e.code)
+
+
+def reduceChunk(args):
+    '''Generate range queries for and attack a chunk of targets in a worker process, keeping only the statistics
+
+    Works like runChunk, but the results are added to a histogram right away, so only the histogram and the list of
+    targets have to be sent back. Unless var.Config.STAT is set, every result is validated (the target has to be one of
+    the candidates) before it is added.
+
+    @param args: The List of (target, repetition)-tuples that should be iterated through
+    @return: A tuple of the list of (target, repetition)-tuples, a util.Statistics.Histogram of their results and the
+        host ID of the first target that is missing from its result (None if all results are valid)
+    '''
+    results = runChunk(args)
+    histogram = util.Statistics.Histogram()
+    for target, _, result in results:
+        if not var.Config.STAT and target not in result:
+            return [], histogram, target
+        histogram.add(data.DB.getPatternLengthUnchecked(target), util.Statistics.getResultCount(result))
+    return [(target, rep) for target, rep, _ in results], histogram, None
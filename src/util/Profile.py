@@ -0,0 +1,184 @@
+'''
+Profiling
+
+Records the wall-clock time, CPU time and memory usage of the phases of a run, and how much of the time spent on
+the targets went into generating range queries and how much into attacking them. Optionally, the attack phase of every
+process is profiled with cProfile.
+
+Nothing is recorded unless enable has been called. The times of generation and attack are summed up over all
+processes: worker processes add their times to a shared array, which must therefore be created (by enable) before the
+workers are forked. The same way, the workers report their memory usage, so other child processes (e.g. the stty call of
+the progress bar) are not counted.
+
+@author: Max Maass
+'''
+import os
+import sys
+import time
+import cProfile
+import resource
+from contextlib import contextmanager
+from multiprocessing import Array, Value
+
+ENABLED = False     # Is profiling enabled?
+DUMPDIR = ""        # Directory the cProfile output of each process is written to (empty to disable cProfile)
+PHASES = []         # List of [name, wall-clock seconds, CPU seconds, RSS at the end in KiB, max RSS so far in KiB,
+                    #          largest RSS of a worker in KiB]
+SPLIT = {"generate": 0.0, "attack": 0.0}    # Seconds spent by this process on generation and attack since the last flush
+KINDS = ["generate", "attack"]              # Order of the kinds in SHARED
+SHARED = None       # Array of the seconds spent on each of KINDS, summed over all processes
+WORKERS = None      # Largest RSS in KiB a worker process has reported during the current phase
+profiler = None     # The cProfile.Profile of this process, if any
+
+
+def enable(dumpdir=""):
+    """Enable profiling
+
+    Must be called before any worker processes are started.
+
+    @param dumpdir: Directory the cProfile output of each process should be written to (empty to disable cProfile)
+    """
+    global ENABLED, DUMPDIR, SHARED, WORKERS
+    ENABLED = True
+    DUMPDIR = dumpdir
+    SHARED = Array('d', len(KINDS))
+    WORKERS = Value('l', 0)
+    if DUMPDIR and not os.path.exists(DUMPDIR):
+        os.makedirs(DUMPDIR)
+
+
+def getCPUTime():
+    """Get the CPU time used so far
+
+    @return: User and system time of this process and its terminated children, in seconds
+    """
+    times = os.times()
+    return times[0] + times[1] + times[2] + times[3]
+
+
+def getRSS():
+    """Get the current memory usage
+
+    ru_maxrss is no substitute: it only ever grows, and forked processes inherit the value of their parent.
+
+    @return: The resident set size of this process in KiB, or 0 if it can not be determined (no /proc/self/statm)
+    """
+    try:
+        with open("/proc/self/statm", "r") as fo:
+            return int(fo.read().split()[1]) * resource.getpagesize() / 1024
+    except (IOError, IndexError, ValueError):
+        return 0
+
+
+@contextmanager
+def phase(name):
+    """Record a phase of the run
+
+    Use in a with-statement around the code of the phase. Phases with the same name are added up, their memory usage is
+    the one of the last of them.
+
+    @param name: The name of the phase
+    """
+    if not ENABLED:
+        yield
+        return
+    wall = time.time()
+    cpu = getCPUTime()
+    WORKERS.value = 0
+    try:
+        yield
+    finally:
+        wall = time.time() - wall
+        cpu = getCPUTime() - cpu
+        rss = getRSS()
+        maxrss = max(rss, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) # ru_maxrss is updated lazily
+        for entry in PHASES:
+            if entry[0] == name:
+                entry[1] += wall
+                entry[2] += cpu
+                entry[3:] = [rss, maxrss, WORKERS.value]
+                break
+        else:
+            PHASES.append([name, wall, cpu, rss, maxrss, WORKERS.value])
+
+
+def measure(kind, function, *args):
+    """Call a function, adding the time it takes to the generation or attack time
+
+    @param kind: "generate" or "attack"
+    @param function: The function
+    @param args: The arguments of the function
+    @return: The return value of the function
+    """
+    if not ENABLED:
+        return function(*args)
+    start = time.time()
+    result = function(*args)
+    SPLIT[kind] += time.time() - start
+    return result
+
+
+def flush(worker=False):
+    """Add the generation and attack times of this process to the shared array
+
+    Worker processes must call this when they are done with a chunk, the main process calls it before the report.
+
+    @param worker: True if called by a worker process, which also reports its current RSS (see WORKERS)
+    """
+    if not ENABLED:
+        return
+    with SHARED.get_lock():
+        for i, kind in enumerate(KINDS):
+            SHARED[i] += SPLIT[kind]
+            SPLIT[kind] = 0.0
+    if worker:
+        rss = getRSS()
+        with WORKERS.get_lock():
+            WORKERS.value = max(WORKERS.value, rss)
+
+
+def startProfiler():
+    """Start profiling this process with cProfile, if a directory for the output has been set"""
+    global profiler
+    if ENABLED and DUMPDIR and profiler is None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+
+def dumpProfiler(role):
+    """Write the cProfile output of this process
+
+    The output is written to DUMPDIR/role-pid.prof, which is overwritten on every call. Profiling continues afterwards,
+    so worker processes, which are terminated without notice, can dump their output after every chunk.
+
+    @param role: The role of the process ("main" or "worker")
+    """
+    if profiler is None:
+        return
+    profiler.disable()
+    profiler.dump_stats(os.path.join(DUMPDIR, "%s-%i.prof" % (role, os.getpid())))
+    profiler.enable()
+
+
+def report(stream=sys.stderr):
+    """Print the recorded phases and the split between generation and attack
+
+    @param stream: The file object to print to
+    """
+    if not ENABLED:
+        return
+    flush()
+    stream.write("%-12s %10s %10s %12s %14s %14s\n" % ("phase", "wall (s)", "CPU (s)", "RSS (KiB)", "max RSS (KiB)",
+                                                         "workers (KiB)"))
+    for name, wall, cpu, rss, maxrss, workers in PHASES:
+        stream.write("%-12s %10.3f %10.3f %12i %14i %14i\n" % (name, wall, cpu, rss, maxrss, workers))
+    stream.write("RSS: at the end of the phase. max RSS: peak of the main process up to the end of the phase. workers: "
+                 "largest RSS of a worker process during the phase.\n")
+    generate, attack = SHARED[0], SHARED[1]
+    total = generate + attack
+    if total > 0:
+        stream.write("Targets: %.3fs generating range queries (%.1f%%), %.3fs attacking (%.1f%%), summed over all processes\n"
+                     % (generate, 100 * generate / total, attack, 100 * attack / total))
+    if DUMPDIR:
+        stream.write("cProfile output written to " + DUMPDIR + "\n")
+    stream.flush()
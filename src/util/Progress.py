@@ -8,33 +8,53 @@ Code inspired by http://stackoverflow.com/a/3160819/1232833, but modified.
 @author: Max Maass
 '''
 import sys
-from math import floor
 import os
-from multiprocessing import Lock
+import time
+from multiprocessing import Value
+
+TTYWIDTH = None         # Cached result of getTTYSize
+RENDER_INTERVAL = 0.5   # Minimum number of seconds between two updates of the progress bar
 
 
 def getTTYSize():
     """get TTY Size
 
-    Determine the size of the tty and return it.
+    Determine the size of the tty and return it. The size is only determined once and cached afterwards.
 
     @return: The tty size (number of characters per line)
     """
-    columns = 50
-    if os.name == "posix":
-        try:    # try to get terminal size using "stty size" (on Linux)
-            _, columns = os.popen('stty size', 'r').read().split()
-        except:  # If anything goes wrong, stop trying and use standard value
-            pass
-    return int(columns)
+    global TTYWIDTH
+    if TTYWIDTH is None:
+        columns = 50
+        if os.name == "posix":
+            try:    # try to get terminal size using "stty size" (on Linux)
+                _, columns = os.popen('stty size 2>/dev/null', 'r').read().split()
+            except:  # If anything goes wrong, stop trying and use standard value
+                pass
+        TTYWIDTH = int(columns)
+    return TTYWIDTH
+
+
+def formatDuration(seconds):
+    """Format a number of seconds as h:mm:ss
+
+    @param seconds: The number of seconds
+    @return: The formatted duration (string)
+    """
+    seconds = int(seconds)
+    return "%i:%02i:%02i" % (seconds / 3600, seconds / 60 % 60, seconds % 60)
 
 
 class Bar():
     """Progress bar implementation
 
-    Implements progress display using a progress bar
+    Implements progress display using a progress bar, followed by the number of finished events, the throughput and
+    the estimated remaining time.
+
+    The number of finished events is kept in shared memory, so the bar can be ticked from worker processes forked after
+    its creation. Ticks are added to the shared counter in batches. Only the process that created the bar draws it, at
+    most every RENDER_INTERVAL seconds.
     """
-    state = 0
 
     def __init__(self, eventCount, pip):
         """Initialize
@@ -44,30 +64,69 @@ class Bar():
         @param eventCount: The expected number of tracked events (that will fill the bar to 100%)
         @param pip: The Character to be used to represent a filled part of the progress bar.
         """
-        ttywidth = getTTYSize()
-        self.onePip = float((ttywidth-2) / float(eventCount))
-        self.state = 0.0
+        self.eventCount = max(eventCount, 1)
         self.pip = pip
-        self.eventCount = eventCount
-        # setup progress bar
-        sys.stderr.write("[%s]" % (" " * (ttywidth-2)))
-        sys.stderr.flush()
-        sys.stderr.write("\b" * (ttywidth-1))  # return to start of line, after '['
-        self.parallelLock = Lock()
+        self.state = Value('l', 0)  # Number of finished events, shared between processes
+        self.pending = 0            # Number of events of this process that have not been added to self.state yet
+        self.flushed = 0            # Value of self.state after the last flush of this process
+        self.step = max(1, self.eventCount / 1000)  # Number of events after which pending events are added to self.state
+        self.owner = os.getpid()    # Only this process draws the bar
+        self.start = time.time()
+        self.lastRender = 0.0
+        self.finished = False
+        self.update(True)
 
-    def tick(self):
+    def tick(self, count=1):
         """Tick
-        
+
         Called on each fired event. Tracks the number of finished events and updates the progress bar.
+
+        @param count: The number of finished events
         """
-        # The following will update the progress bar.
-        with self.parallelLock:
-            cstate = self.state
-            nstate = cstate + 1
-            if floor(cstate * self.onePip) < floor(nstate * self.onePip):
-                sys.stderr.write("%s" % (self.pip * int(floor(nstate * self.onePip) - floor(cstate * self.onePip))))
-                sys.stderr.flush()
-            if nstate == self.eventCount:
-                sys.stderr.write("\n")
-            self.state = nstate
+        self.pending += count
+        if self.pending >= self.step or self.flushed + self.pending >= self.eventCount:
+            self.flush()
+            self.update()
+
+    def flush(self):
+        """Add the events ticked by this process to the shared counter
+
+        Worker processes must call this when they are done, so that the last ticks are not lost.
+        """
+        if self.pending:
+            with self.state.get_lock():
+                self.state.value += self.pending
+                self.flushed = self.state.value
+            self.pending = 0
+
+    def update(self, force=False):
+        """Redraw the progress bar
+
+        Does nothing if called from another process than the one that created the bar, or if the bar has been drawn less
+        than RENDER_INTERVAL seconds ago (unless force is set or all events have finished).
+
+        @param force: Redraw regardless of the time of the last update
+        """
+        if os.getpid() != self.owner or self.finished:
             return
+        now = time.time()
+        state = min(self.state.value, self.eventCount)
+        if state < self.eventCount and not force and now - self.lastRender < RENDER_INTERVAL:
+            return
+        self.lastRender = now
+        elapsed = now - self.start
+        rate = state / elapsed if elapsed > 0 else 0.0
+        if state == self.eventCount:
+            eta = "done in " + formatDuration(elapsed)
+        elif rate > 0:
+            eta = "ETA " + formatDuration((self.eventCount - state) / rate)
+        else:
+            eta = "ETA -:--:--"
+        info = " %i/%i %.1f/s %s" % (state, self.eventCount, rate, eta)
+        width = max(getTTYSize() - len(info) - 3, 10)
+        filled = int(width * state / self.eventCount)
+        sys.stderr.write("\r[%s%s]%s" % (self.pip * filled, " " * (width - filled), info))
+        if state == self.eventCount:
+            sys.stderr.write("\n")
+            self.finished = True
+        sys.stderr.flush()
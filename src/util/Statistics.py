@@ -0,0 +1,117 @@
+'''
+Statistics about the results of attacks
+
+@author: Max Maass
+'''
+import math
+
+
+def getResultCount(result):
+    """Get the number of possible results of an attack
+
+    @param result: The result of an attack, either the list of possible results or, for the counting attackers (see
+        attacker.Pattern.getCounter), their number
+    @return: The number of possible results
+    """
+    if isinstance(result, (int, long)):
+        return result
+    return len(result)
+
+
+def getQuantile(confidence):
+    """Get the quantile of the standard normal distribution for a two-sided confidence interval
+
+    @param confidence: The confidence level, between 0 and 1 (e.g. 0.95)
+    @return: z, so that a standard normal variable lies in [-z, z] with probability confidence
+    """
+    low, high = 0.0, 40.0
+    for _ in range(100): # Bisection, the probability grows with z
+        middle = (low + high) / 2
+        if math.erf(middle / math.sqrt(2)) < confidence:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def getIntervalWidth(count, total, z):
+    """Get the width of the confidence interval of a proportion
+
+    Uses the Wilson score interval, which, unlike the normal approximation, does not collapse for proportions of 0 or 1.
+
+    @param count: The number of samples with the property
+    @param total: The total number of samples (> 0)
+    @param z: The quantile of the confidence level, as returned by getQuantile
+    @return: The width of the interval (upper bound minus lower bound)
+    """
+    p = float(count) / total
+    return 2 * z * math.sqrt(p * (1 - p) / total + z * z / (4.0 * total * total)) / (1 + z * z / total)
+
+
+class Histogram():
+    """k-definiteness histograms, accumulated online
+
+    seperateSum[pattern_length][num_of_attack_results] contains the number of attacks on patterns of the length
+    pattern_length that returned num_of_attack_results results, overallSum[num_of_attack_results] the same number
+    aggregated over all pattern lengths. Only these counts are kept, so the memory needed does not depend on the
+    number of attacked targets.
+    """
+
+    def __init__(self):
+        """Initialize an empty histogram"""
+        self.seperateSum = {}
+        self.overallSum = {}
+
+    def add(self, pattern_length, ard_len, number=1):
+        """Count attacks
+
+        @param pattern_length: Length of the pattern of the attacked target
+        @param ard_len: Number of results of the attack
+        @param number: Number of attacks with these values
+        """
+        try:
+            seperateSum = self.seperateSum[pattern_length]
+        except KeyError:
+            seperateSum = self.seperateSum[pattern_length] = {}
+        seperateSum[ard_len] = seperateSum.get(ard_len, 0) + number
+        self.overallSum[ard_len] = self.overallSum.get(ard_len, 0) + number
+
+    def merge(self, other):
+        """Add the counts of another histogram to this one
+
+        @param other: A Histogram instance
+        """
+        for pattern_length in other.seperateSum:
+            for ard_len, number in other.seperateSum[pattern_length].iteritems():
+                self.add(pattern_length, ard_len, number)
+
+    def count(self):
+        """Get the number of counted attacks
+
+        @return: The number of attacks
+        """
+        return sum(self.overallSum.itervalues())
+
+    def getWidestInterval(self, z, minShare=0.0):
+        """Get the widest confidence interval of the proportions in the histograms
+
+        Considers the proportion of every number of results, both aggregated over all pattern lengths and for each
+        pattern length on its own.
+
+        @param z: The quantile of the confidence level, as returned by getQuantile
+        @param minShare: Pattern lengths with less than this share of all counted attacks are ignored (0 to 1)
+        @return: A tuple of the width and the pattern length it belongs to (None for the aggregated histogram). The width
+            is infinite if no attacks have been counted.
+        """
+        total = self.count()
+        if total == 0:
+            return float("inf"), None
+        widest = max(getIntervalWidth(number, total, z) for number in self.overallSum.itervalues()), None
+        for pattern_length, counts in self.seperateSum.iteritems():
+            samples = sum(counts.itervalues())
+            if samples < minShare * total:
+                continue
+            width = max(getIntervalWidth(number, samples, z) for number in counts.itervalues())
+            if width > widest[0]:
+                widest = width, pattern_length
+        return widest
@@ -0,0 +1,74 @@
+'''
+Streaming output of attack results
+
+Writes one record per attacked target as soon as the result is available, so the results do not have to be kept in
+memory until the end of the run.
+
+@author: Max Maass
+'''
+import os
+import json
+import data.DB
+import util.Error
+import util.Statistics
+from collections import OrderedDict
+
+
+class JSONLSink():
+    """Result sink writing one JSON object per line
+
+    Each record has the form {"target": hostname, "M": pattern_length, "k": number_of_results}, plus
+    "candidates": [hostnames] if the candidates are requested.
+    Use as a context manager, the file is closed on exit.
+    """
+
+    def __init__(self, path, candidates=False, append=False, offset=None):
+        """Initialize
+
+        @param path: Path of the output file
+        @param candidates: True if the records should contain the list of candidates
+        @param append: True to append to an existing file, False to overwrite it
+        @param offset: If appending, the size in bytes the existing file is cut to first (see tell), or None to keep it
+            as it is. Used to drop the records written after the last checkpoint of an interrupted run.
+        """
+        if append and offset is not None and os.path.exists(path):
+            if os.path.getsize(path) < offset:
+                util.Error.printErrorAndExit("Stream: " + path + " is shorter than when the checkpoint was saved")
+            with open(path, "r+") as fo:
+                fo.truncate(offset)
+        self.fo = open(path, "a" if append else "w")
+        self.candidates = candidates
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, target, pattern_length, result):
+        """Write the record of one attack
+
+        @param target: The attacked target (host ID)
+        @param pattern_length: The length of the pattern of the target
+        @param result: The result of the attack (list of host IDs, or their number if the candidates are not requested)
+        """
+        record = OrderedDict([("target", data.DB.getHostname(target)), ("M", pattern_length),
+                              ("k", util.Statistics.getResultCount(result))])
+        if self.candidates:
+            record["candidates"] = [data.DB.getHostname(host) for host in result]
+        self.fo.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def tell(self):
+        """Get the size of the output file, including the records that have not been flushed yet
+
+        @return: The number of bytes written to the file so far
+        """
+        return self.fo.tell()
+
+    def flush(self):
+        """Flush the records written so far to the output file"""
+        self.fo.flush()
+
+    def close(self):
+        """Close the output file"""
+        self.fo.close()
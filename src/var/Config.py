@@ -10,4 +10,24 @@ INFILE = ""         # Path to pattern file
 RQSIZE = 0          # Range Query Size (Number of Queries per Range Query block)
 THREADS = 1         # Number of Threads (or, more accurately, subprocesses) to be used
 MODENUM = -1		# Number of the active mode
-DBSPLIT = 0			# Size of reduced Database
\ No newline at end of file
+DBSPLIT = 0			# Size of reduced Database
+REDUCE = False      # Reduce the results to histograms in the worker processes?
+FLAT = False        # Keep the databases in flat arrays for the worker processes (see data.DB.flatten)?
+ENGINE = "set"      # Attack engine for the modes without distinguishable blocks ("set" or "matrix")
+BATCH = 64          # Number of range queries attacked at once by engines that support batches
+CHUNKSIZE = 0       # Number of targets per work unit of the parallel processing (0 to choose automatically)
+STREAM = ""         # Path of the file the results are streamed to (empty if results are kept in memory)
+CANDIDATES = False  # Include the candidate lists in the streamed results?
+CHECKPOINT = -1     # Number of seconds between two checkpoints (0 or less to disable checkpoints)
+CACHE = True        # Load and write the compiled cache of the pattern file?
+SEED = None         # Seed of the random number generators of the run (None if not seeded)
+CI = 0.0            # Width of the confidence intervals at which an adaptive run stops (0 for a fixed number of targets)
+CONFIDENCE = 0.95   # Confidence level of the confidence intervals
+CIMINSHARE = 0.01   # Minimum share of the targets a pattern length needs to be considered by the stopping rule
+MAXTARGETS = 0      # Maximum number of targets of an adaptive run (0 for no limit)
+MAXTIME = 0         # Maximum number of seconds of an adaptive run (0 for no limit)
+STRATIFY = ""       # Allocation of the targets to the pattern lengths ("proportional", "equal", "neyman", or empty for none)
+REPLACE = True      # Are random targets drawn with replacement?
+PILOT = 10          # Number of targets per pattern length in the pilot sample of the Neyman allocation
+COUNT = False       # Only count the possible results of the attacks?
+CAP = 0             # Stop counting the possible results of an attack once there are more than CAP (0 for no cap)
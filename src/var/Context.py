@@ -0,0 +1,134 @@
+'''
+Run contexts
+
+Holds the settings of a single run (mode, size of the range queries, size of the client database and seed). Generators
+and output functions take their settings from a context, so one process can run several configurations (see --sweep)
+without changing var.Config in between.
+
+The context also provides the random number generators of a run. Every combination of seed, target and repetition gets
+its own generator, seeded with a hash of the three. A range query therefore only depends on the seed, its target and
+how many range queries have been generated for that target before, not on the process generating it, the chunking of
+the targets or the order in which they are processed.
+
+@author: Max Maass
+'''
+import random
+import struct
+import hashlib
+import var.Config
+
+
+class RunContext():
+    """Settings of a single run"""
+
+    def __init__(self, mode, rqsize, dbsplit, seed=None):
+        """Initialize
+
+        @param mode: Number of the mode (see -m)
+        @param rqsize: Range Query Size (Number of Queries per Range Query block)
+        @param dbsplit: Size of the client database (-1 for all queries)
+        @param seed: Seed of the run (None to use the random module instead of separate random number generators)
+        """
+        self.mode = mode
+        self.rqsize = rqsize
+        self.dbsplit = dbsplit
+        self.seed = seed
+
+    def __repr__(self):
+        return "m=%i, N=%i, S=%i" % (self.mode, self.rqsize, self.dbsplit)
+
+    def getRandom(self, target, rep=0):
+        """Get the random number generator for a target
+
+        Target -1 is used for the random numbers of the run itself, like the choice of the targets.
+
+        @param target: The host ID of the target
+        @param rep: The number of range queries generated for the target before in this run
+        @return: A new random.Random instance, or the random module if the context has no seed
+        """
+        if self.seed is None:
+            return random
+        digest = hashlib.sha1(struct.pack("<qqq", self.seed, target, rep)).digest()
+        return random.Random(struct.unpack("<Q", digest[:8])[0])
+
+
+def getRepetitions(targets, skipped=None):
+    """Number the occurrences of the targets in a list
+
+    Targets can be chosen more than once. The n-th range query for a target is generated using the random number
+    generator for repetition n (see RunContext.getRandom).
+
+    @param targets: List of targets (host IDs)
+    @param skipped: Dictionary mapping targets to the number of their range queries that have already been generated
+        before the list (e.g. before a run has been interrupted), or None
+    @return: List of repetition numbers, one for each target in the list
+    """
+    counts = dict(skipped) if skipped is not None else {}
+    repetitions = []
+    for target in targets:
+        rep = counts.get(target, 0)
+        repetitions.append(rep)
+        counts[target] = rep + 1
+    return repetitions
+
+
+def fromConfig():
+    """Get the context described by var.Config
+
+    @return: A RunContext with the values of var.Config.MODENUM, var.Config.RQSIZE, var.Config.DBSPLIT and var.Config.SEED
+    """
+    return RunContext(var.Config.MODENUM, var.Config.RQSIZE, var.Config.DBSPLIT, var.Config.SEED)
+
+
+def parseValues(spec):
+    """Parse a list of integers
+
+    @param spec: Comma-separated values, each either an integer or an inclusive range "a..b"
+    @return: List of integers, in the given order
+    """
+    values = []
+    for part in spec.split(","):
+        if ".." in part:
+            start, end = part.split("..", 1)
+            values.extend(range(int(start), int(end) + 1))
+        else:
+            values.append(int(part))
+    return values
+
+
+def parseSweep(spec, mode, rqsize, dbsplit, seed=None):
+    """Parse the specification of a parameter sweep
+
+    The specification consists of "key=values" pairs separated by semicolons, where key is one of m, s and p (like the
+    options) and values is a list as accepted by parseValues, e.g. "m=1..6;s=10,50;p=-1". Parameters that are not given
+    keep the provided default. Raises a ValueError if the specification is invalid.
+
+    @param spec: The specification
+    @param mode: Default mode
+    @param rqsize: Default size of the range queries
+    @param dbsplit: Default size of the client database
+    @param seed: Seed of all runs
+    @return: List of RunContexts, one for each combination of values. Contexts with the same dbsplit are adjacent, so the
+        client database only has to be partitioned once for each of them.
+    """
+    grid = {"m": [mode], "s": [rqsize], "p": [dbsplit]}
+    for item in spec.split(";"):
+        if not item.strip():
+            continue
+        key, _, values = item.partition("=")
+        key = key.strip()
+        if key not in grid or not values:
+            raise ValueError("invalid sweep parameter '" + item + "', expected m=..., s=... or p=...")
+        try:
+            grid[key] = parseValues(values.replace(" ", ""))
+        except ValueError:
+            raise ValueError("invalid values in sweep parameter '" + item + "'")
+        if not grid[key]:
+            raise ValueError("empty sweep parameter '" + item + "'")
+    for m in grid["m"]:
+        if m not in range(1, 7):
+            raise ValueError("invalid mode " + str(m) + " in sweep")
+    for s in grid["s"]:
+        if s < 1:
+            raise ValueError("invalid range query size " + str(s) + " in sweep")
+    return [RunContext(m, s, p, seed) for p in grid["p"] for s in grid["s"] for m in grid["m"]]